@@ -0,0 +1,81 @@
+"""Пережатие загруженных изображений: время и сэкономленные байты.
+
+По умолчанию корпус генерируется (фото с телефона, скриншот, картинка
+с прозрачностью, маленький GIF); свой корпус можно передать через
+--corpus каталог_с_картинками.
+"""
+import argparse
+import io
+import os
+
+from utils import measure, setup_django
+
+
+def synthetic_corpus():
+    from PIL import Image
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    photo = Image.merge('RGB', [
+        Image.effect_noise((4032, 3024), 40),
+        Image.linear_gradient('L').resize((4032, 3024)),
+        Image.effect_noise((4032, 3024), 20),
+    ])
+    screenshot = Image.linear_gradient('L').resize((1920, 1080)).convert(
+        'RGB'
+    )
+    logo = Image.new('RGBA', (800, 600), (200, 30, 30, 128))
+    corpus = []
+    for name, image, params in (
+        ('photo.jpg', photo, {'format': 'JPEG', 'quality': 95,
+                              'exif': exif.tobytes()}),
+        ('screenshot.png', screenshot, {'format': 'PNG'}),
+        ('logo.png', logo, {'format': 'PNG'}),
+        ('tiny.gif', Image.new('P', (2, 1)), {'format': 'GIF'}),
+    ):
+        buffer = io.BytesIO()
+        image.save(buffer, **params)
+        corpus.append((name, buffer.getvalue()))
+    return corpus
+
+
+def load_corpus(path):
+    return [
+        (name, open(os.path.join(path, name), 'rb').read())
+        for name in sorted(os.listdir(path))
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--corpus')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    setup_django()
+
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from posts.images import ingest
+
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus()
+    total_before = total_after = 0
+    width = max(len(name) for name, _ in corpus)
+    for name, data in corpus:
+        result = ingest(SimpleUploadedFile(name, data))
+        elapsed = measure(
+            lambda: ingest(SimpleUploadedFile(name, data)), args.repeat
+        )
+        total_before += result.original_size
+        total_after += result.size
+        print(
+            f'{name.ljust(width)}  {result.original_size / 1024:9.1f} KB'
+            f' -> {result.size / 1024:9.1f} KB  {result.width}x{result.height}'
+            f'  {elapsed:8.1f} ms'
+        )
+    saved = total_before - total_after
+    print(
+        f'Сэкономлено {saved / 1024:.1f} KB '
+        f'({saved / max(total_before, 1):.0%} от {total_before / 1024:.1f} KB)'
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Загрузка постов: команда import_posts против Post.objects.create по одному.
+
+Кроме времени печатает пик памяти Python при импорте двух файлов разного
+размера: при потоковом чтении он перестаёт расти после первых порций
+и дальше от длины файла не зависит.
+"""
+import argparse
+import json
+import os
+import tracemalloc
+from io import StringIO
+
+from utils import measure, report, setup_django
+
+
+def write_posts(path, count, authors, start_id):
+    with open(path, 'w', encoding='utf-8') as file:
+        for i in range(count):
+            file.write(json.dumps({
+                'type': 'post',
+                'id': start_id + i,
+                'author': f'author{i % authors}',
+                'group': f'group{i % 10}',
+                'text': f'Пост номер {i} ' * 20,
+            }) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=20000)
+    parser.add_argument('--authors', type=int, default=500)
+    args = parser.parse_args()
+    temp_dir = setup_django()
+
+    from django.contrib.auth import get_user_model
+    from django.core.management import call_command
+    from posts.models import Post
+
+    User = get_user_model()
+    small = os.path.join(temp_dir, 'small.jsonl')
+    large = os.path.join(temp_dir, 'large.jsonl')
+    write_posts(small, args.posts // 10, args.authors, 1)
+    write_posts(large, args.posts, args.authors, 10 ** 7)
+
+    def import_file(path):
+        tracemalloc.start()
+        call_command('import_posts', path, stdout=StringIO())
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+
+    small_peak = import_file(small)
+    large_peak = import_file(large)
+    print(f'пик памяти: {args.posts // 10} строк — {small_peak / 2**20:.1f} '
+          f'МБ, {args.posts} строк — {large_peak / 2**20:.1f} МБ')
+
+    Post.objects.filter(id__gte=10 ** 7).delete()
+    author = User.objects.get(username='author0')
+    one_by_one = 200
+    report([
+        (f'{args.posts} posts, import_posts',
+         measure(lambda: call_command(
+             'import_posts', large, stdout=StringIO()
+         ), repeat=1)),
+        (f'{one_by_one} posts, Post.objects.create',
+         measure(lambda: [
+             Post.objects.create(author=author, text=f'Пост {i} ' * 20)
+             for i in range(one_by_one)
+         ], repeat=1)),
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Сравнение Paginator (OFFSET + COUNT) и CursorPaginator.
+
+Меряет первую и 5000-ю страницу ленты под обоими паджинаторами.
+"""
+import argparse
+
+from utils import measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=60000)
+    parser.add_argument('--page', type=int, default=5000)
+    args = parser.parse_args()
+    setup_django()
+
+    from django.contrib.auth import get_user_model
+    from django.core.paginator import Paginator
+    from posts.models import Post
+    from posts.paginator import CursorPaginator
+    from posts.views import POSTS_QUANTITY
+
+    author = get_user_model().objects.create_user(username='bench')
+    Post.objects.bulk_create(
+        (Post(author=author, text=f'Пост {i}') for i in range(args.posts)),
+        batch_size=500,
+    )
+    post_list = Post.objects.select_related('author', 'group')
+    # Курсор, который пользователь получил бы, дойдя до нужной страницы
+    boundary = post_list[(args.page - 1) * POSTS_QUANTITY - 1]
+    deep_cursor = CursorPaginator(post_list, POSTS_QUANTITY).cursor_for(
+        boundary
+    )
+
+    def offset_page(number):
+        return lambda: list(
+            Paginator(post_list, POSTS_QUANTITY).get_page(number)
+        )
+
+    def cursor_page(before):
+        return lambda: list(
+            CursorPaginator(post_list, POSTS_QUANTITY).get_page(before=before)
+        )
+
+    report([
+        ('Paginator, page 1', measure(offset_page(1))),
+        (f'Paginator, page {args.page}', measure(offset_page(args.page))),
+        ('CursorPaginator, page 1', measure(cursor_page(None))),
+        (f'CursorPaginator, page {args.page}',
+         measure(cursor_page(deep_cursor))),
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""Время отрисовки страницы ленты с кэшем карточек постов и без него.
+
+«Холодная» отрисовка собирает каждую карточку заново (кэш очищается
+перед каждым замером), «тёплая» склеивает уже закэшированный HTML.
+"""
+import argparse
+import os
+
+from utils import measure, report, setup_django
+
+
+def make_image(path):
+    from PIL import Image
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.new('RGB', (1200, 800), 'navy').save(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--posts', type=int, default=10)
+    args = parser.parse_args()
+    setup_django()
+
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.core.cache import cache
+    from django.template.loader import render_to_string
+    from posts.models import Group, Post
+
+    author = get_user_model().objects.create_user(
+        username='bench', first_name='Лев', last_name='Толстой'
+    )
+    group = Group.objects.create(
+        title='Группа', slug='bench', description='Описание'
+    )
+    for i in range(args.posts):
+        name = f'posts/bench_{i}.png'
+        make_image(os.path.join(settings.MEDIA_ROOT, name))
+        Post.objects.create(
+            author=author, group=group, text=f'Пост {i} ' * 50, image=name
+        )
+    posts = list(Post.objects.select_related('author', 'group'))
+
+    def render():
+        return render_to_string('posts/index.html', {'page_obj': posts})
+
+    def cold():
+        cache.clear()
+        render()
+
+    # Первая отрисовка создаёт миниатюры, её в замеры не включаем
+    render()
+    report([
+        (f'{args.posts} cards, cold cache', measure(cold)),
+        (f'{args.posts} cards, warm cache', measure(render)),
+    ])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""LocMemCache против TieredCache на нескольких воркерах.
+
+Каждый воркер отдаёт страницы из общего набора; промах кэша стоит
+«отрисовки» страницы. У LocMemCache кэш свой в каждом процессе, поэтому
+каждую страницу рисует каждый воркер; у TieredCache страница, нарисованная
+одним воркером, видна остальным через общий L2.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import time
+
+from utils import measure, report, setup_django
+
+PAGE = b'x' * 20000
+
+
+def make_cache(kind, location):
+    from django.core.cache.backends.locmem import LocMemCache
+    from core.cache import TieredCache
+    if kind == 'locmem':
+        return LocMemCache('bench', {'OPTIONS': {'MAX_ENTRIES': 10000}})
+    return TieredCache(location, {'OPTIONS': {'MAX_ENTRIES': 10000}})
+
+
+def worker(args):
+    kind, location, seed, requests, pages, render_ms = args
+    cache = make_cache(kind, location)
+    rng = random.Random(seed)
+    misses = 0
+    for _ in range(requests):
+        key = f'page:{rng.randrange(pages)}'
+        if cache.get(key) is None:
+            misses += 1
+            time.sleep(render_ms / 1000)
+            cache.set(key, PAGE, 3600)
+    return misses
+
+
+def run(kind, location, options):
+    jobs = [
+        (kind, location, seed, options.requests, options.pages,
+         options.render_ms)
+        for seed in range(options.workers)
+    ]
+    start = time.perf_counter()
+    with multiprocessing.get_context('fork').Pool(options.workers) as pool:
+        misses = sum(pool.map(worker, jobs))
+    return (time.perf_counter() - start) * 1000, misses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--pages', type=int, default=300)
+    parser.add_argument('--render-ms', type=float, default=5)
+    options = parser.parse_args()
+    temp_dir = setup_django()
+    location = os.path.join(temp_dir, 'cache.sqlite3')
+
+    rows = []
+    for kind in ('locmem', 'tiered'):
+        elapsed, misses = run(kind, location, options)
+        rows.append((f'{kind}, {options.workers} workers, wall', elapsed))
+        print(f'{kind}: {misses} renders')
+    for kind in ('locmem', 'tiered'):
+        cache = make_cache(kind, location)
+        cache.set('hot', PAGE, 3600)
+        cache.get('hot')
+        rows.append((
+            f'{kind}, 1000 hot gets',
+            measure(lambda: [cache.get('hot') for _ in range(1000)]),
+        ))
+    report(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Подсказки по началу имени: индекс в памяти против LIKE 'q%' в базе.
+
+Индекс отвечает из отсортированного списка через bisect; ORM делает
+username__istartswith с LIMIT на каждый запрос.
+"""
+import argparse
+
+from utils import measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=50000)
+    args = parser.parse_args()
+    setup_django()
+
+    from django.contrib.auth import get_user_model
+    from posts import typeahead
+
+    User = get_user_model()
+    # bulk_create обходит сигналы, индекс загрузится из базы целиком
+    User.objects.bulk_create(
+        User(username=f'user{i:06d}', password='!')
+        for i in range(args.users)
+    )
+    prefixes = ['user0', 'user01', 'user0123', 'user01234', 'nobody']
+
+    def index():
+        for prefix in prefixes:
+            typeahead.users.search(prefix)
+
+    def orm():
+        for prefix in prefixes:
+            list(User.objects.filter(
+                username__istartswith=prefix
+            ).values_list('username', flat=True)[:10])
+
+    report([
+        (f'index load, {args.users} users',
+         measure(lambda: typeahead.users._reload(None), repeat=3)),
+        (f'{len(prefixes)} lookups, prefix index', measure(index, 200)),
+        (f'{len(prefixes)} lookups, ORM istartswith', measure(orm, 20)),
+    ])
+
+
+if __name__ == '__main__':
+    main()
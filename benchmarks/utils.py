@@ -0,0 +1,51 @@
+"""Общая подготовка Django для бенчмарков.
+
+Бенчмарки работают на отдельной временной базе SQLite, чтобы не трогать
+db.sqlite3 проекта. Запуск: python benchmarks/<имя_скрипта>.py
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_DIR = os.path.join(BASE_DIR, 'yatube')
+
+
+def setup_django():
+    """Настраивает Django на временную базу и применяет миграции."""
+    sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    from django.conf import settings
+    temp_dir = tempfile.mkdtemp(prefix='yatube-bench-')
+    settings.DATABASES['default']['NAME'] = os.path.join(
+        temp_dir, 'db.sqlite3'
+    )
+    settings.MEDIA_ROOT = os.path.join(temp_dir, 'media')
+    settings.CACHES['default']['LOCATION'] = os.path.join(
+        temp_dir, 'cache.sqlite3'
+    )
+    settings.DEBUG = False
+    import django
+    django.setup()
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    return temp_dir
+
+
+def measure(func, repeat=20):
+    """Возвращает медианное время вызова func в миллисекундах."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def report(rows):
+    """Печатает таблицу «название — миллисекунды»."""
+    width = max(len(name) for name, _ in rows)
+    for name, value in rows:
+        print(f'{name.ljust(width)}  {value:10.3f} ms')
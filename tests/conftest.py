@@ -1,4 +1,7 @@
 import os
+import shutil
+
+import pytest
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
@@ -37,3 +40,27 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True, scope='session')
+def isolated_cache():
+    """Отдельный файл кэша на прогон, как у manage.py test."""
+    from core.test_runner import isolated_caches
+
+    caches, directory = isolated_caches()
+    with caches:
+        yield
+    shutil.rmtree(directory, ignore_errors=True)
+
+
+@pytest.fixture(autouse=True, scope='session')
+def wait_for_thumbnails():
+    """Запрос с загрузкой дожидается миниатюр.
+
+    Иначе фоновый поток дописывает их уже после того, как mock_media
+    удалил временную папку.
+    """
+    from django.test import override_settings
+
+    with override_settings(THUMBNAIL_UPLOAD_WAIT=10):
+        yield
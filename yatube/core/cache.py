@@ -0,0 +1,345 @@
+"""Двухуровневый кэш: LRU в памяти процесса поверх общего файла SQLite.
+
+L1 — ограниченный LRU в памяти каждого процесса, L2 — таблица в файле
+SQLite, общем для всех воркеров. Любая запись в L2 добавляет ключ
+в журнал изменений; перед чтением процесс дочитывает журнал с последней
+виденной записи и выбрасывает из L1 изменённые ключи, поэтому
+инвалидация в одном воркере сразу видна во всех остальных.
+
+Подключение в settings.CACHES:
+
+    'default': {
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': '/путь/к/cache.sqlite3',
+        'OPTIONS': {'L1_MAX_ENTRIES': 1000, 'MAX_ENTRIES': 10000},
+    }
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Раз в сколько записей процесс чистит L2 от просроченных и лишних ключей
+CULL_EVERY = 100
+# Сколько ключей get_many подставляет в один запрос: старые сборки
+# SQLite ограничивают число параметров 999
+MANY_CHUNK = 500
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache_entry ('
+    ' key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)',
+    'CREATE TABLE IF NOT EXISTS cache_log ('
+    ' id INTEGER PRIMARY KEY AUTOINCREMENT, key TEXT)',
+)
+
+
+class TieredCache(BaseCache):
+    """Кэш с локальным L1 и общим для процессов L2 в SQLite."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._l1_max_entries = int(options.get('L1_MAX_ENTRIES', 1000))
+        self._log_max_entries = int(options.get('LOG_MAX_ENTRIES', 10000))
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _connection(self):
+        """Соединение текущего потока; после fork состояние сбрасывается."""
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reset()
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._connect()
+            self._local.connection = connection
+        return connection
+
+    def _reset(self):
+        self._local = threading.local()
+        self._l1 = OrderedDict()
+        self._writes = 0
+        connection = self._connect()
+        self._local.connection = connection
+        self._last_seen = connection.execute(
+            'SELECT COALESCE(MAX(id), 0) FROM cache_log'
+        ).fetchone()[0]
+        self._pid = os.getpid()
+
+    def _connect(self):
+        connection = sqlite3.connect(
+            self._path, timeout=30, isolation_level=None,
+            check_same_thread=False,
+        )
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        for statement in SCHEMA:
+            connection.execute(statement)
+        return connection
+
+    def _sync(self, connection):
+        """Дочитывает журнал и выбрасывает из L1 изменённые ключи.
+
+        Возвращает номер последней учтённой записи журнала.
+        """
+        seen = self._last_seen
+        rows = connection.execute(
+            'SELECT id, key FROM cache_log WHERE id > ? ORDER BY id', (seen,)
+        ).fetchall()
+        if not rows:
+            return seen
+        with self._lock:
+            # Разрыв в номерах значит, что часть журнала уже удалена,
+            # а None — что весь кэш очищен: L1 больше нельзя доверять
+            if rows[0][0] != seen + 1 or any(
+                key is None for _, key in rows
+            ):
+                self._l1.clear()
+            else:
+                for _, key in rows:
+                    self._l1.pop(key, None)
+            self._last_seen = max(self._last_seen, rows[-1][0])
+            return self._last_seen
+
+    def _remember(self, key, value, expires, seen):
+        """Кладёт значение в L1, если журнал не сдвинулся с момента чтения."""
+        with self._lock:
+            if self._last_seen != seen:
+                return
+            self._l1[key] = (value, expires)
+            self._l1.move_to_end(key)
+            while len(self._l1) > self._l1_max_entries:
+                self._l1.popitem(last=False)
+
+    def _forget(self, key):
+        with self._lock:
+            self._l1.pop(key, None)
+
+    def _write(self, connection, statements):
+        """Выполняет запись в L2 одной транзакцией вместе с журналом."""
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            changed = 0
+            for sql, params in statements:
+                changed += connection.execute(sql, params).rowcount
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        self._writes += 1
+        if self._writes % CULL_EVERY == 0:
+            self._cull(connection)
+        return changed
+
+    def _cull(self, connection):
+        connection.execute(
+            'DELETE FROM cache_entry WHERE expires <= ?', (time.time(),)
+        )
+        count = connection.execute(
+            'SELECT COUNT(*) FROM cache_entry'
+        ).fetchone()[0]
+        if count > self._max_entries:
+            # Первыми уходят давно записанные ключи: INSERT OR REPLACE
+            # выдаёт перезаписанному ключу новый rowid
+            connection.execute(
+                'DELETE FROM cache_entry WHERE rowid IN ('
+                'SELECT rowid FROM cache_entry ORDER BY rowid LIMIT ?)',
+                (max(count // self._cull_frequency, 1),),
+            )
+        connection.execute(
+            'DELETE FROM cache_log WHERE id <= '
+            '(SELECT MAX(id) FROM cache_log) - ?',
+            (self._log_max_entries,),
+        )
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        connection = self._connection()
+        seen = self._sync(connection)
+        now = time.time()
+        with self._lock:
+            entry = self._l1.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires is None or expires > now:
+                    self._l1.move_to_end(key)
+                    return pickle.loads(value)
+                del self._l1[key]
+        row = connection.execute(
+            'SELECT value, expires FROM cache_entry WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return default
+        value, expires = row
+        if expires is not None and expires <= now:
+            return default
+        self._remember(key, value, expires, seen)
+        return pickle.loads(value)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = self.get_backend_timeout(timeout)
+        connection = self._connection()
+        seen = self._sync(connection)
+        self._write(connection, [
+            ('INSERT OR REPLACE INTO cache_entry (key, value, expires) '
+             'VALUES (?, ?, ?)', (key, value, expires)),
+            ('INSERT INTO cache_log (key) VALUES (?)', (key,)),
+        ])
+        self._remember(key, value, expires, seen)
+
+    def get_many(self, keys, version=None):
+        """Читает ключи из L1, а недостающие — одним запросом к L2."""
+        keys = {self.make_key(key, version=version): key for key in keys}
+        for key in keys:
+            self.validate_key(key)
+        connection = self._connection()
+        seen = self._sync(connection)
+        now = time.time()
+        found = {}
+        missing = []
+        with self._lock:
+            for key, original in keys.items():
+                entry = self._l1.get(key)
+                if entry is not None and (entry[1] is None or entry[1] > now):
+                    self._l1.move_to_end(key)
+                    found[original] = pickle.loads(entry[0])
+                else:
+                    missing.append(key)
+        for start in range(0, len(missing), MANY_CHUNK):
+            chunk = missing[start:start + MANY_CHUNK]
+            rows = connection.execute(
+                'SELECT key, value, expires FROM cache_entry '
+                'WHERE key IN ({})'.format(', '.join('?' * len(chunk))),
+                chunk,
+            ).fetchall()
+            for key, value, expires in rows:
+                if expires is not None and expires <= now:
+                    continue
+                self._remember(key, value, expires, seen)
+                found[keys[key]] = pickle.loads(value)
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        """Записывает все ключи в L2 одной транзакцией."""
+        expires = self.get_backend_timeout(timeout)
+        entries = []
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            entries.append((key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)))
+        if not entries:
+            return []
+        connection = self._connection()
+        seen = self._sync(connection)
+        statements = []
+        for key, value in entries:
+            statements.append((
+                'INSERT OR REPLACE INTO cache_entry (key, value, expires) '
+                'VALUES (?, ?, ?)', (key, value, expires),
+            ))
+            statements.append(
+                ('INSERT INTO cache_log (key) VALUES (?)', (key,))
+            )
+        self._write(connection, statements)
+        for key, value in entries:
+            self._remember(key, value, expires, seen)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        expires = self.get_backend_timeout(timeout)
+        connection = self._connection()
+        seen = self._sync(connection)
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute(
+                'DELETE FROM cache_entry WHERE key = ? AND expires <= ?',
+                (key, time.time()),
+            )
+            added = connection.execute(
+                'INSERT OR IGNORE INTO cache_entry (key, value, expires) '
+                'VALUES (?, ?, ?)', (key, value, expires),
+            ).rowcount == 1
+            if added:
+                connection.execute(
+                    'INSERT INTO cache_log (key) VALUES (?)', (key,)
+                )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        if added:
+            self._remember(key, value, expires, seen)
+        return added
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарно увеличивает число: счётчик общий для всех воркеров.
+
+        У BaseCache это get и set, между которыми другой процесс может
+        записать то же значение.
+        """
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        connection = self._connection()
+        self._forget(key)
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT value FROM cache_entry WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)', (key, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache_entry SET value = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key),
+            )
+            connection.execute(
+                'INSERT INTO cache_log (key) VALUES (?)', (key,)
+            )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._forget(key)
+        return self._write(self._connection(), [
+            ('UPDATE cache_entry SET expires = ? WHERE key = ?',
+             (self.get_backend_timeout(timeout), key)),
+            ('INSERT INTO cache_log (key) VALUES (?)', (key,)),
+        ]) > 1
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._forget(key)
+        return self._write(self._connection(), [
+            ('DELETE FROM cache_entry WHERE key = ?', (key,)),
+            ('INSERT INTO cache_log (key) VALUES (?)', (key,)),
+        ]) > 1
+
+    def clear(self):
+        connection = self._connection()
+        with self._lock:
+            self._l1.clear()
+        self._write(connection, [
+            ('DELETE FROM cache_entry', ()),
+            ('INSERT INTO cache_log (key) VALUES (NULL)', ()),
+        ])
@@ -0,0 +1,39 @@
+"""Запуск тестов с отдельным файлом кэша.
+
+Иначе тесты делили бы кэш с dev-сервером: cache.clear() в тестах
+стирал бы рабочий кэш, а версии тегов и страницы из одного прогона
+доставались бы следующему.
+"""
+import copy
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+def isolated_caches():
+    """Настройки CACHES с файлами кэша во временной папке.
+
+    Возвращает override_settings и папку, которую надо удалить после тестов.
+    """
+    directory = tempfile.mkdtemp(prefix='yatube-test-cache-')
+    caches = copy.deepcopy(settings.CACHES)
+    for alias, options in caches.items():
+        if options['BACKEND'] == 'core.cache.TieredCache':
+            options['LOCATION'] = os.path.join(directory, f'{alias}.sqlite3')
+    return override_settings(CACHES=caches), directory
+
+
+class IsolatedCacheRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._caches, self._cache_dir = isolated_caches()
+        self._caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._caches.disable()
+        shutil.rmtree(self._cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
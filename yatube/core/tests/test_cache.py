@@ -0,0 +1,98 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+from ..cache import TieredCache
+
+
+class TieredCacheTest(SimpleTestCase):
+    """Два экземпляра на одном файле ведут себя как два воркера."""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir, ignore_errors=True)
+        self.location = os.path.join(self.temp_dir, 'cache.sqlite3')
+        self.first = self.make_cache()
+        self.second = self.make_cache()
+
+    def make_cache(self, **options):
+        return TieredCache(self.location, {'OPTIONS': options})
+
+    def test_value_is_shared(self):
+        """Значение, записанное одним воркером, видно другому."""
+        self.first.set('key', {'value': 1})
+        self.assertEqual(self.second.get('key'), {'value': 1})
+        self.assertIsNone(self.second.get('missing'))
+
+    def test_l1_stays_coherent(self):
+        """Перезапись и удаление в одном воркере сбрасывают L1 другого."""
+        self.first.set('key', 'old')
+        self.assertEqual(self.second.get('key'), 'old')
+        self.first.set('key', 'new')
+        self.assertEqual(self.second.get('key'), 'new')
+        self.first.delete('key')
+        self.assertIsNone(self.second.get('key'))
+        self.second.set('key', 'value')
+        self.first.clear()
+        self.assertIsNone(self.second.get('key'))
+
+    def test_many(self):
+        """set_many и get_many работают пачкой и видны другому воркеру."""
+        self.first.set_many({'a': 1, 'b': 2, 'gone': 3})
+        self.assertEqual(self.second.get('a'), 1)
+        self.first.delete('gone')
+        self.assertEqual(
+            self.second.get_many(['a', 'b', 'gone', 'missing']),
+            {'a': 1, 'b': 2},
+        )
+
+    def test_add_and_expiry(self):
+        """add не перезаписывает живой ключ, просроченный ключ не отдаётся."""
+        self.assertTrue(self.first.add('lock', 1))
+        self.assertFalse(self.second.add('lock', 2))
+        self.assertEqual(self.second.get('lock'), 1)
+        self.first.set('gone', 'value', timeout=0)
+        self.assertIsNone(self.second.get('gone'))
+        self.assertTrue(self.second.add('gone', 'again'))
+
+    def test_incr_is_shared(self):
+        """incr считает от значения в L2, а не от копии в L1."""
+        self.first.add('counter', 0, None)
+        self.assertEqual(self.second.get('counter'), 0)
+        self.assertEqual(self.first.incr('counter'), 1)
+        self.assertEqual(self.second.incr('counter', 2), 3)
+        self.assertEqual(self.first.get('counter'), 3)
+        with self.assertRaises(ValueError):
+            self.second.incr('missing')
+
+    def test_l1_is_bounded(self):
+        """L1 хранит не больше L1_MAX_ENTRIES ключей."""
+        cache = self.make_cache(L1_MAX_ENTRIES=3)
+        for i in range(10):
+            cache.set(f'key{i}', i)
+            cache.get(f'key{i}')
+        self.assertEqual(len(cache._l1), 3)
+        self.assertEqual(cache.get('key0'), 0)
+
+    def test_pruned_log_clears_l1(self):
+        """Если журнал обрезан дальше виденной записи, L1 очищается."""
+        reader = self.make_cache()
+        writer = self.make_cache(LOG_MAX_ENTRIES=1)
+        writer.set('key', 'value')
+        self.assertEqual(reader.get('key'), 'value')
+        for i in range(200):
+            writer.set(f'other{i}', i)
+        self.assertEqual(reader.get('other0'), 0)
+        self.assertNotIn(reader.make_key('key'), reader._l1)
+        self.assertEqual(reader.get('key'), 'value')
+
+
+class IsolatedCacheTest(SimpleTestCase):
+    def test_tests_do_not_share_project_cache(self):
+        """Тесты пишут в свой временный файл, а не в кэш проекта."""
+        location = settings.CACHES['default']['LOCATION']
+        self.assertTrue(location.startswith(tempfile.gettempdir()))
+        self.assertIn('yatube-test-cache-', location)
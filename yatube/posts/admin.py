@@ -1,5 +1,7 @@
 from django.contrib import admin
 from .models import Post, Group, Comment
+from .paginator import CachedCountPaginator
+from .search import matching_ids, to_match
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -14,6 +16,17 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ('text',)
     list_filter = ('created',)
     empty_value_display = '-пусто-'
+    # На большой таблице постов не пересчитываем COUNT(*) на каждый запрос
+    paginator = CachedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет по индексу FTS5 вместо LIKE '%q%' по всей таблице."""
+        if not to_match(search_term):
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return queryset.filter(id__in=matching_ids(search_term)), False
 
 
 admin.site.register(Post, PostAdmin)
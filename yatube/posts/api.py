@@ -0,0 +1,182 @@
+"""Read-only JSON API лент и постов для мобильного клиента.
+
+Ленты отдаются теми же курсорами ?before=/?after=, что и HTML-страницы.
+Параметр fields= выбирает поля ответа, и из базы через values() читаются
+только нужные колонки; ids= на общей ленте отдаёт много постов одним
+запросом. Ответы кэшируются под теми же тегами, что и страницы.
+"""
+from functools import wraps
+
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+
+from .models import Group, Post, User
+from .page_cache import (
+    GLOBAL, author_tag, cache_tagged, group_tag, tags_for_post
+)
+from .paginator import (
+    ValuesCursorPaginator, db_int, decode_cursor, get_page,
+)
+from .views import POSTS_QUANTITY, TIMEOUT
+
+MAX_QUANTITY: int = 100
+MAX_IDS: int = 100
+
+# Поле ответа → колонка для values()
+FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'created': 'created',
+    'updated': 'updated',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'image_width': 'image_width',
+    'image_height': 'image_height',
+    'image_placeholder': 'image_placeholder',
+    'comments_count': 'comments_count',
+}
+DEFAULT_FIELDS = (
+    'id', 'text', 'created', 'author', 'group', 'image', 'comments_count'
+)
+# Колонки, без которых не построить курсор
+CURSOR_COLUMNS = ('created', 'id')
+
+
+class BadRequest(Exception):
+    pass
+
+
+def api_view(view):
+    """Отвечает на BadRequest и Http404 JSON с описанием ошибки."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except BadRequest as error:
+            return JsonResponse({'error': str(error)}, status=400)
+        except Http404:
+            return JsonResponse({'error': 'Не найдено'}, status=404)
+    return wrapper
+
+
+def requested_fields(request):
+    if 'fields' not in request.GET:
+        return DEFAULT_FIELDS
+    fields = tuple(
+        field for field in request.GET['fields'].split(',') if field
+    )
+    unknown = [field for field in fields if field not in FIELDS]
+    if unknown or not fields:
+        raise BadRequest(
+            f'Неизвестные поля: {", ".join(unknown)}. '
+            f'Доступны: {", ".join(FIELDS)}'
+        )
+    return fields
+
+
+def columns(fields):
+    needed = [FIELDS[field] for field in fields]
+    return needed + [name for name in CURSOR_COLUMNS if name not in needed]
+
+
+def serialize(row, fields):
+    item = {field: row[FIELDS[field]] for field in fields}
+    if 'image' in item:
+        item['image'] = image_url(item['image'])
+    return item
+
+
+def image_url(name):
+    if not name:
+        return None
+    return Post._meta.get_field('image').storage.url(name)
+
+
+def page_link(request, **changes):
+    params = request.GET.copy()
+    for name in ('before', 'after'):
+        params.pop(name, None)
+    params.update(changes)
+    return '?' + params.urlencode()
+
+
+def feed_response(request, posts):
+    """Страница ленты с курсорами соседних страниц."""
+    fields = requested_fields(request)
+    try:
+        per_page = min(
+            int(request.GET.get('limit', POSTS_QUANTITY)), MAX_QUANTITY
+        )
+    except ValueError:
+        raise BadRequest('limit должен быть числом')
+    for name in ('before', 'after'):
+        # Страницы сайта молча начинают с начала, а API говорит об ошибке
+        if request.GET.get(name) and decode_cursor(request.GET[name]) is None:
+            raise BadRequest(f'{name} — курсор из ссылки next или previous')
+    paginator = ValuesCursorPaginator(
+        posts.values(*columns(fields)), max(per_page, 1)
+    )
+    page = get_page(request, paginator)
+    return JsonResponse({
+        'results': [serialize(row, fields) for row in page],
+        'next': (
+            page_link(request, before=page.next_cursor)
+            if page.has_next() else None
+        ),
+        'previous': (
+            page_link(request, after=page.previous_cursor)
+            if page.has_previous() else None
+        ),
+    })
+
+
+@api_view
+@cache_tagged(TIMEOUT, lambda request: [GLOBAL])
+def index(request):
+    """Общая лента; с ids=1,2,3 — эти посты одним запросом."""
+    if 'ids' not in request.GET:
+        return feed_response(request, Post.objects.all())
+    try:
+        ids = [db_int(pk) for pk in request.GET['ids'].split(',') if pk]
+    except ValueError:
+        raise BadRequest('ids — список id через запятую')
+    if len(ids) > MAX_IDS:
+        raise BadRequest(f'Не больше {MAX_IDS} id за запрос')
+    fields = requested_fields(request)
+    rows = {
+        row['id']: row
+        for row in Post.objects.filter(id__in=ids).values(*columns(fields))
+    }
+    # Порядок запроса; отсутствующие посты пропускаются
+    return JsonResponse({'results': [
+        serialize(rows[pk], fields) for pk in dict.fromkeys(ids)
+        if pk in rows
+    ]})
+
+
+@api_view
+@cache_tagged(TIMEOUT, lambda request, slug: [group_tag(slug)])
+def group_posts(request, slug):
+    """Лента группы."""
+    group = get_object_or_404(Group.objects.only('id'), slug=slug)
+    return feed_response(request, Post.objects.filter(group_id=group.id))
+
+
+@api_view
+@cache_tagged(TIMEOUT, lambda request, username: [author_tag(username)])
+def profile_posts(request, username):
+    """Лента автора."""
+    author = get_object_or_404(User.objects.only('id'), username=username)
+    return feed_response(request, Post.objects.filter(author_id=author.id))
+
+
+@api_view
+@cache_tagged(TIMEOUT, lambda request, post_id: tags_for_post(post_id))
+def post_detail(request, post_id):
+    """Один пост."""
+    fields = requested_fields(request)
+    row = get_object_or_404(
+        Post.objects.values(*columns(fields)), id=post_id
+    )
+    return JsonResponse(serialize(row, fields))
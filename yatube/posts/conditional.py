@@ -0,0 +1,106 @@
+"""Условные GET-запросы: ETag для страниц постов.
+
+ETag страницы считается одним коротким запросом по штампам времени
+и счётчикам показанных записей, без рендеринга и без обращения к кэшу
+страниц. Если версия у клиента совпадает с текущей, он получает 304
+ещё до вызова view.
+
+Last-Modified не отправляется: самая свежая правка не сдвигается
+при удалении поста, переносе в другую группу или подписке, и клиент,
+который проверяет только If-Modified-Since, получал бы 304 на
+устаревшую страницу. Эти изменения видны только по счётчикам в ETag.
+"""
+import hashlib
+from functools import wraps
+
+from django.db.models import DateTimeField, Max, OuterRef, Subquery
+from django.utils.cache import get_conditional_response, patch_cache_control
+
+from .models import Group, Post, User
+from .stats import count_subquery
+
+
+def conditional(validators):
+    """Отвечает 304, если страница у клиента не изменилась.
+
+    validators(request, *args, **kwargs) возвращает части версии или
+    None, если показывать нечего, — тогда решает сама view. В ETag
+    входит и пользователь: страницы у гостя и у автора различаются.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            parts = validators(request, *args, **kwargs)
+            if parts is None:
+                return view(request, *args, **kwargs)
+            etag = make_etag(request.user.pk, *parts)
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                # Ленты ставят его сами по дате последнего поста
+                del response['Last-Modified']
+                # Кэш страниц сбрасывается при записи, а браузер без
+                # проверки показывал бы старую версию до max-age
+                del response['Expires']
+                patch_cache_control(response, private=True, max_age=0)
+            return response
+        return wrapper
+    return decorator
+
+
+def make_etag(*parts) -> str:
+    raw = ':'.join(str(part) for part in parts)
+    return f'"{hashlib.md5(raw.encode()).hexdigest()}"'
+
+
+def post_validators(request, post_id):
+    """Пост: updated меняется и при правке, и при комментариях."""
+    row = Post.objects.filter(id=post_id).values_list(
+        'updated', 'author__stats__posts_count'
+    ).first()
+    if row is None:
+        return None
+    updated, posts_count = row
+    return updated.isoformat(), posts_count
+
+
+def last_updated(field):
+    """Подзапрос: самая свежая правка постов по полю field."""
+    updated = Post.objects.filter(
+        **{field: OuterRef('pk')}
+    ).order_by().values(field).annotate(last=Max('updated')).values('last')
+    return Subquery(updated, output_field=DateTimeField())
+
+
+def group_validators(request, slug):
+    """Группа: описание, самая свежая правка и число постов."""
+    try:
+        title, description, last, total = Group.objects.filter(
+            slug=slug
+        ).annotate(
+            last=last_updated('group'),
+            total=count_subquery(Post.objects, 'group'),
+        ).values_list('title', 'description', 'last', 'total').get()
+    except Group.DoesNotExist:
+        return None
+    return title, description, last and last.isoformat(), total
+
+
+def author_validators(request, username):
+    """Автор: самая свежая правка его постов и счётчики профиля."""
+    try:
+        last, *counters = User.objects.filter(username=username).annotate(
+            last=last_updated('author')
+        ).values_list(
+            'last',
+            'stats__posts_count',
+            'stats__followers_count',
+            'stats__following_count',
+        ).get()
+    except User.DoesNotExist:
+        return None
+    return (last and last.isoformat(), *counters)
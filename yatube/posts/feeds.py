@@ -0,0 +1,104 @@
+"""RSS- и Atom-ленты групп и авторов.
+
+XML ленты кэшируется под тегом группы или автора, поэтому строится
+заново только после нового поста или правки. Опрос ленты идёт через
+условный GET: пока постов не прибавилось, клиент получает 304.
+"""
+from django.contrib.syndication.views import Feed
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.feedgenerator import Atom1Feed
+
+from .conditional import author_validators, conditional, group_validators
+from .models import Group, User
+from .page_cache import author_tag, cache_tagged, group_tag
+from .views import TIMEOUT
+
+FEED_QUANTITY: int = 20
+TITLE_LENGTH: int = 60
+
+
+class PostsFeed(Feed):
+    """Общая часть лент: последние посты объекта obj."""
+
+    def items(self, obj):
+        return obj.posts.select_related('author')[:FEED_QUANTITY]
+
+    def item_title(self, item):
+        title = item.text.splitlines()[0] if item.text else ''
+        if len(title) > TITLE_LENGTH:
+            return title[:TITLE_LENGTH - 1] + '…'
+        return title
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', kwargs={'post_id': item.id})
+
+    def item_pubdate(self, item):
+        return item.created
+
+    def item_updateddate(self, item):
+        return item.updated
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+
+class GroupFeed(PostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, obj):
+        return f'Записи сообщества {obj.title}'
+
+    def link(self, obj):
+        return reverse('posts:group_list', kwargs={'slug': obj.slug})
+
+    def description(self, obj):
+        return obj.description
+
+
+class AuthorFeed(PostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, obj):
+        return f'Посты пользователя {obj.get_full_name() or obj.username}'
+
+    def link(self, obj):
+        return reverse('posts:profile', kwargs={'username': obj.username})
+
+    def description(self, obj):
+        return self.title(obj)
+
+
+class GroupAtomFeed(GroupFeed):
+    feed_type = Atom1Feed
+    subtitle = GroupFeed.description
+
+
+class AuthorAtomFeed(AuthorFeed):
+    feed_type = Atom1Feed
+    subtitle = AuthorFeed.description
+
+
+def group_view(feed):
+    return conditional(group_validators)(
+        cache_tagged(TIMEOUT, lambda request, slug: [group_tag(slug)])(feed)
+    )
+
+
+def author_view(feed):
+    return conditional(author_validators)(
+        cache_tagged(
+            TIMEOUT, lambda request, username: [author_tag(username)]
+        )(feed)
+    )
+
+
+group_rss = group_view(GroupFeed())
+group_atom = group_view(GroupAtomFeed())
+author_rss = author_view(AuthorFeed())
+author_atom = author_view(AuthorAtomFeed())
@@ -1,12 +1,52 @@
+import logging
+
+from .images import ingest
 from .models import Post, Comment
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image
+
+logger = logging.getLogger(__name__)
 
 
 class PostForm(forms.ModelForm):
+    # Всё, что меняет правка поста. Остальные колонки (например,
+    # comments_count, который сигналы меняют F-выражением) не
+    # перезаписываются значениями, прочитанными в начале запроса
+    SAVED_FIELDS = (
+        'text', 'group', 'image', 'image_width', 'image_height',
+        'image_placeholder', 'updated',
+    )
+
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        """Уменьшает и пережимает новое изображение перед сохранением.
+
+        Размеры и цвет-заглушку запишет в пост сигнал pre_save.
+        """
+        image = self.cleaned_data.get('image')
+        if not isinstance(image, UploadedFile):
+            return image
+        try:
+            ingested = ingest(image)
+        except (OSError, Image.DecompressionBombError):
+            # Заголовок ImageField проверил, а обрезанные или слишком
+            # большие данные выясняются только при декодировании
+            logger.info('Не удалось декодировать изображение %s', image.name)
+            raise forms.ValidationError(
+                self.fields['image'].error_messages['invalid_image'],
+                code='invalid_image',
+            )
+        logger.info(
+            'Изображение %s: %d → %d байт (%dx%d)',
+            image.name, ingested.original_size, ingested.size,
+            ingested.width, ingested.height,
+        )
+        return ingested.file
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -0,0 +1,157 @@
+"""Приём изображений постов: уменьшение, пережатие и очистка метаданных.
+
+Загруженная картинка ограничивается по большей стороне
+POST_IMAGE_MAX_SIDE, поворачивается по EXIF-ориентации и пережимается
+без EXIF (в нём бывают координаты съёмки): фотографии — в прогрессивный
+JPEG, картинки с прозрачностью или палитрой — в PNG. JPEG декодируется
+в draft-режиме, то есть сразу в уменьшенном масштабе, поэтому фотография
+с телефона не разворачивается в память целиком. Анимированные изображения
+и файлы, которые пережатие не уменьшает, сохраняются как есть.
+
+Заодно считаются размеры и средний цвет картинки: они хранятся в строке
+поста, и карточка размечается и закрашивается до загрузки изображения.
+"""
+import io
+import logging
+import os
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+JPEG_QUALITY = 85
+EXIF_ORIENTATION = 0x0112
+
+Ingested = namedtuple(
+    'Ingested',
+    ('file', 'original_size', 'size', 'width', 'height', 'placeholder'),
+)
+# Размеры и цвет-заглушка, которые хранятся в строке поста
+Described = namedtuple('Described', ('width', 'height', 'placeholder'))
+
+
+def has_alpha(image) -> bool:
+    return image.mode in ('RGBA', 'LA', 'PA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def dominant_color(image) -> str:
+    """Средний цвет картинки в виде #rrggbb; прозрачность — на белом."""
+    image = image.copy()
+    image.thumbnail((64, 64))
+    if has_alpha(image):
+        image = Image.alpha_composite(
+            Image.new('RGBA', image.size, 'white'), image.convert('RGBA')
+        )
+    pixel = image.convert('RGB').resize((1, 1), Image.BOX).getpixel((0, 0))
+    return '#{:02x}{:02x}{:02x}'.format(*pixel)
+
+
+def describe(file) -> Described:
+    """Размеры (с учётом EXIF-ориентации) и средний цвет изображения."""
+    image = Image.open(file)
+    width, height = image.size
+    if image.getexif().get(EXIF_ORIENTATION, 1) in (5, 6, 7, 8):
+        # Повёрнутый на 90° снимок показывается с переставленными сторонами
+        width, height = height, width
+    if image.format == 'JPEG':
+        # Для среднего цвета хватит картинки, уменьшенной при декодировании
+        image.draft('RGB', (64, 64))
+    return Described(width, height, dominant_color(image))
+
+
+def fill_meta(post):
+    """Записывает в пост размеры и цвет-заглушку его изображения.
+
+    Вызывается перед каждым сохранением поста, поэтому поля заполняются
+    при любой загрузке: через форму, админку или ORM. Уже описанный файл
+    заново не открывается; если файл не читается, поля остаются пустыми
+    до backfill_image_meta.
+    """
+    image = post.image
+    if not image:
+        post.image_width = post.image_height = None
+        post.image_placeholder = ''
+        return
+    if image._committed and image.name == getattr(
+        post, '_described_image', None
+    ):
+        return
+    try:
+        if image._committed:
+            with image.storage.open(image.name) as file:
+                meta = describe(file)
+        else:
+            # Новая загрузка ещё не записана в хранилище
+            file = image.file
+            file.seek(0)
+            try:
+                meta = describe(file)
+            finally:
+                file.seek(0)
+    except (OSError, SuspiciousFileOperation, Image.DecompressionBombError):
+        logger.warning('Не удалось прочитать изображение %s', image.name)
+        return
+    post.image_width, post.image_height, post.image_placeholder = meta
+
+
+def ingest(upload):
+    """Готовит загруженное изображение к хранению.
+
+    Возвращает Ingested с файлом для сохранения, размерами в байтах
+    до и после, итоговыми шириной и высотой и средним цветом.
+    """
+    max_side = settings.POST_IMAGE_MAX_SIDE
+    upload.seek(0)
+    original = upload.read()
+    image = Image.open(io.BytesIO(original))
+    if getattr(image, 'is_animated', False):
+        upload.seek(0)
+        return Ingested(
+            upload, len(original), len(original), *image.size,
+            dominant_color(image),
+        )
+    has_exif = bool(image.info.get('exif'))
+    oversized = max(image.size) > max_side
+    if image.format == 'JPEG' and oversized:
+        # Декодер сразу уменьшает картинку в 2, 4 или 8 раз,
+        # но не меньше итогового размера
+        scale = max_side / max(image.size)
+        image.draft('RGB', (
+            round(image.width * scale), round(image.height * scale)
+        ))
+    icc_profile = image.info.get('icc_profile')
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    if has_alpha(image) or image.mode in ('P', '1'):
+        # Прозрачность и рисунки с палитрой JPEG испортил бы
+        if has_alpha(image):
+            image = image.convert('RGBA')
+        image_format, extension, params = 'PNG', '.png', {'optimize': True}
+    else:
+        image = image.convert('RGB')
+        image_format, extension, params = 'JPEG', '.jpg', {
+            'quality': JPEG_QUALITY, 'optimize': True, 'progressive': True,
+        }
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, icc_profile=icc_profile, **params)
+    data = buffer.getvalue()
+    if not oversized and not has_exif and len(data) >= len(original):
+        upload.seek(0)
+        return Ingested(
+            upload, len(original), len(original), *image.size,
+            dominant_color(image),
+        )
+    name = os.path.splitext(os.path.basename(upload.name))[0] + extension
+    return Ingested(
+        SimpleUploadedFile(name, data, f'image/{image_format.lower()}'),
+        len(original),
+        len(data),
+        *image.size,
+        dominant_color(image),
+    )
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.images import describe
+from posts.models import Post
+
+from .rebuild_thumbnails import BATCH_SIZE, iter_images
+
+FIELDS = ('image_width', 'image_height', 'image_placeholder', 'updated')
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет размеры и цвет-заглушку изображений постов, '
+        'загруженных до появления этих полей.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересчитать и посты, у которых поля уже заполнены'
+        )
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        posts = Post.objects.exclude(image='').order_by('id')
+        if not options['all']:
+            posts = posts.filter(image_width__isnull=True)
+        stats = {'done': 0, 'missing': 0, 'failed': 0}
+        batch = []
+        for post_id, name in iter_images(posts):
+            try:
+                with storage.open(name) as file:
+                    meta = describe(file)
+            except FileNotFoundError:
+                stats['missing'] += 1
+                continue
+            except Exception:
+                self.stderr.write(f'Пост {post_id}: ошибка в {name}')
+                stats['failed'] += 1
+                continue
+            # updated меняется, чтобы закэшированные карточки
+            # перерисовались с заглушкой
+            batch.append(Post(
+                id=post_id,
+                image_width=meta.width,
+                image_height=meta.height,
+                image_placeholder=meta.placeholder,
+                updated=timezone.now(),
+            ))
+            stats['done'] += 1
+            if len(batch) == BATCH_SIZE:
+                Post.objects.bulk_update(batch, FIELDS)
+                batch = []
+        if batch:
+            Post.objects.bulk_update(batch, FIELDS)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {stats["done"]}, без исходного файла: '
+            f'{stats["missing"]}, с ошибкой: {stats["failed"]}'
+        ))
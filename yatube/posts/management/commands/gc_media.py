@@ -0,0 +1,129 @@
+import os
+import shutil
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from posts import thumbnails
+from posts.models import Post
+
+
+def walk(path):
+    """Отдаёт файлы каталога рекурсивно по мере обхода, без списка."""
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                yield from walk(entry.path)
+            elif entry.is_file(follow_symlinks=False):
+                yield entry
+
+
+def referenced_names():
+    """Имена изображений постов и всех их миниатюр."""
+    backend = thumbnails.PregeneratedThumbnailBackend()
+    names = set()
+    images = Post.objects.exclude(image='').values_list('image', flat=True)
+    for name in images.iterator():
+        names.add(name)
+        source = thumbnails.source_file(name)
+        for geometry, options in thumbnails.geometries():
+            names.add(backend.thumbnail_file(source, geometry, options).name)
+    return names
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет из MEDIA_ROOT изображения, на которые не ссылается ни один '
+        'пост, и миниатюры, которые шаблоны больше не запрашивают.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Ничего не удалять, только посчитать освобождаемое место'
+        )
+        parser.add_argument(
+            '--quarantine',
+            help='Переносить файлы в этот каталог вместо удаления'
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=24 * 60 * 60,
+            help='Не трогать файлы моложе стольких секунд (по умолчанию сутки)'
+        )
+
+    def handle(self, *args, **options):
+        # Файл могли загрузить, пока собирались ссылки; свежие не трогаем
+        deadline = time.time() - options['min_age']
+        referenced = referenced_names()
+        image_storage = Post._meta.get_field('image').storage
+        roots = (
+            (Post._meta.get_field('image').upload_to, image_storage),
+            (sorl_settings.THUMBNAIL_PREFIX, default.storage),
+        )
+        stats = {'files': 0, 'bytes': 0, 'young': 0, 'reused': 0}
+        for directory, storage in roots:
+            directory = os.path.join(settings.MEDIA_ROOT, directory)
+            if not os.path.isdir(directory):
+                continue
+            for entry in walk(directory):
+                name = os.path.relpath(entry.path, settings.MEDIA_ROOT)
+                name = name.replace(os.sep, '/')
+                if name in referenced:
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+                if stat.st_mtime > deadline:
+                    stats['young'] += 1
+                    continue
+                if not options['dry_run'] and self.reused(
+                    entry.path, name, storage is image_storage, deadline
+                ):
+                    stats['reused'] += 1
+                    continue
+                stats['files'] += 1
+                stats['bytes'] += stat.st_size
+                if options['dry_run']:
+                    continue
+                self.remove(entry.path, name, options['quarantine'])
+                # Запись sorl о файле тоже больше не нужна
+                default.kvstore.delete(
+                    ImageFile(name, storage), delete_thumbnails=False
+                )
+        verb = 'Можно удалить' if options['dry_run'] else 'Удалено'
+        if options['quarantine'] and not options['dry_run']:
+            verb = 'Перенесено в карантин'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb}: {stats["files"]} файлов, '
+            f'{stats["bytes"] / 2 ** 20:.1f} МБ; '
+            f'пропущено свежих: {stats["young"]}, '
+            f'снова используются: {stats["reused"]}'
+        ))
+
+    def reused(self, path, name, is_image, deadline):
+        """Проверяет файл ещё раз прямо перед удалением.
+
+        Ссылки собраны в начале, а за время обхода пост мог получить
+        это же изображение: хранилище отдаёт новому посту уже
+        существующий файл и обновляет его время изменения.
+        """
+        if is_image and Post.objects.filter(image=name).exists():
+            return True
+        try:
+            return os.stat(path).st_mtime > deadline
+        except FileNotFoundError:
+            # Файл уже убрали, удалять нечего
+            return True
+
+    def remove(self, path, name, quarantine):
+        if not quarantine:
+            os.remove(path)
+            return
+        target = os.path.join(quarantine, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(path, target)
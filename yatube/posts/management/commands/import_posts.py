@@ -0,0 +1,512 @@
+import csv
+import json
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import (
+    IntegrityError, connection, reset_queries, transaction
+)
+from django.core.validators import validate_slug
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import page_cache, search, timeline, typeahead
+from posts.models import Comment, Follow, Group, Post, User, UserStats
+from posts.stats import actual_counts, count_subquery
+
+from .reconcile_user_stats import FIELDS as STATS_FIELDS
+
+# Порция записей на одну транзакцию; списки id порции уходят в IN (...),
+# поэтому она меньше лимита параметров старых SQLite
+CHUNK_SIZE = 500
+REPORT_EVERY = 10000
+KINDS = ('post', 'comment', 'follow')
+USERNAME_LENGTH = User._meta.get_field('username').max_length
+SLUG_LENGTH = Group._meta.get_field('slug').max_length
+validate_username = UnicodeUsernameValidator()
+
+
+class InvalidRecord(Exception):
+    pass
+
+
+def read_records(path, fmt):
+    """Построчно читает файл: пары (номер строки, запись).
+
+    Записи CSV — словари, строки JSONL разбираются позже, чтобы ошибка
+    в одной строке не останавливала чтение.
+    """
+    with open(path, encoding='utf-8', newline='') as file:
+        if fmt == 'csv':
+            reader = csv.DictReader(file)
+            for record in reader:
+                yield reader.line_num, record
+            return
+        for number, line in enumerate(file, 1):
+            if line.strip():
+                yield number, line
+
+
+@contextmanager
+def imported_timestamps():
+    """Отключает auto_now, чтобы даты брались из импортируемых данных."""
+    fields = [
+        Post._meta.get_field('created'),
+        Post._meta.get_field('updated'),
+        Comment._meta.get_field('created'),
+    ]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def text_value(record, name, required=True):
+    value = record.get(name)
+    if value in (None, ''):
+        if required:
+            raise InvalidRecord(f'нет поля {name}')
+        return None
+    return str(value)
+
+
+def checked(value, name, validator, max_length):
+    """Значение, из которого выйдет рабочий адрес страницы.
+
+    Иначе reverse() на страницах с таким автором или группой упал бы
+    с NoReverseMatch.
+    """
+    if len(value) > max_length:
+        raise InvalidRecord(f'слишком длинное значение в поле {name}')
+    try:
+        validator(value)
+    except ValidationError:
+        raise InvalidRecord(f'{name}: недопустимое значение {value!r}')
+    return value
+
+
+def username_value(record, name):
+    return checked(
+        text_value(record, name), name, validate_username, USERNAME_LENGTH
+    )
+
+
+def slug_value(record, name):
+    slug = text_value(record, name, required=False)
+    if slug is None:
+        return None
+    return checked(slug, name, validate_slug, SLUG_LENGTH)
+
+
+def int_value(record, name, required=True):
+    value = text_value(record, name, required)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise InvalidRecord(f'{name} должно быть числом')
+
+
+def date_value(record, name):
+    value = text_value(record, name, required=False)
+    if value is None:
+        return timezone.now()
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise InvalidRecord(f'{name}: непонятная дата {value}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def clean(record, default_kind):
+    """Проверяет запись и приводит её поля к нужным типам."""
+    if not isinstance(record, dict):
+        raise InvalidRecord('запись должна быть объектом')
+    kind = record.get('type') or default_kind
+    if kind == 'post':
+        return kind, {
+            'id': int_value(record, 'id', required=False),
+            'author': username_value(record, 'author'),
+            'group': slug_value(record, 'group'),
+            'text': text_value(record, 'text'),
+            'created': date_value(record, 'created'),
+        }
+    if kind == 'comment':
+        return kind, {
+            'post': int_value(record, 'post'),
+            'author': username_value(record, 'author'),
+            'text': text_value(record, 'text'),
+            'created': date_value(record, 'created'),
+        }
+    if kind == 'follow':
+        user = username_value(record, 'user')
+        author = username_value(record, 'author')
+        if user == author:
+            raise InvalidRecord('нельзя подписаться на себя')
+        return kind, {'user': user, 'author': author}
+    raise InvalidRecord(f'неизвестный тип записи {kind!r}')
+
+
+class Importer:
+    """Копит порцию записей и вставляет её одной транзакцией.
+
+    Авторы и группы ищутся по словарям имя → id в памяти; недостающие
+    создаются пачкой. bulk_create обходит сигналы, поэтому счётчики,
+    кэш страниц и подсказки обновляются здесь же, а поиск и ленты
+    подписок — один раз в конце (finish).
+    """
+
+    def __init__(self, on_error):
+        # Ошибки сразу уходят наружу, а не копятся в памяти
+        self.on_error = on_error
+        self.user_ids = dict(
+            User.objects.values_list('username', 'id').iterator()
+        )
+        self.group_ids = dict(Group.objects.values_list('slug', 'id'))
+        self.pending = {kind: [] for kind in KINDS}
+        self.inserted = Counter()
+        self.errors = 0
+        self.new_users = 0
+        self.new_groups = 0
+        self.explicit_ids = False
+        # Чьи ленты подписок пересобрать в конце
+        self.timeline_users = set()
+
+    def __len__(self):
+        return sum(len(records) for records in self.pending.values())
+
+    def error(self, number, message):
+        self.errors += 1
+        self.on_error(number, message)
+
+    def add(self, number, kind, fields):
+        fields['line'] = number
+        self.pending[kind].append(fields)
+
+    def flush(self):
+        if not len(self):
+            return
+        lines = [
+            record['line']
+            for records in self.pending.values() for record in records
+        ]
+        try:
+            with transaction.atomic():
+                self.resolve_users()
+                self.resolve_groups()
+                posts = self.insert_posts()
+                commented = self.insert_comments()
+                follows = self.insert_follows()
+                tags = self.refresh(posts, commented, follows)
+        except IntegrityError as error:
+            # Например, пост с тем же id вставили параллельно;
+            # предыдущие порции сохранены
+            raise CommandError(
+                f'Строки {min(lines)}–{max(lines)} не загружены: {error}'
+            )
+        # Транзакция уже закрыта, поэтому хватает одной смены версий
+        # вместо двойной в page_cache.invalidate
+        page_cache.bump(tags)
+        self.pending = {kind: [] for kind in KINDS}
+        # При DEBUG Django копит все запросы, и память росла бы с файлом
+        reset_queries()
+
+    def resolve_users(self):
+        names = {
+            record[field]
+            for kind, fields in (
+                ('post', ('author',)),
+                ('comment', ('author',)),
+                ('follow', ('user', 'author')),
+            )
+            for record in self.pending[kind]
+            for field in fields
+        }
+        missing = names - self.user_ids.keys()
+        if not missing:
+            return
+        User.objects.bulk_create(
+            [
+                User(username=name, password=make_password(None))
+                for name in missing
+            ],
+            ignore_conflicts=True,
+        )
+        self.user_ids.update(
+            User.objects.filter(username__in=missing).values_list(
+                'username', 'id'
+            )
+        )
+        # Без строки счётчиков recount пропустил бы новых пользователей
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=self.user_ids[name]) for name in missing],
+            ignore_conflicts=True,
+        )
+        self.new_users += len(missing)
+
+    def resolve_groups(self):
+        missing = {
+            record['group'] for record in self.pending['post']
+            if record['group'] is not None
+        } - self.group_ids.keys()
+        if not missing:
+            return
+        Group.objects.bulk_create(
+            [
+                Group(slug=slug, title=slug, description='')
+                for slug in missing
+            ],
+            ignore_conflicts=True,
+        )
+        self.group_ids.update(
+            Group.objects.filter(slug__in=missing).values_list('slug', 'id')
+        )
+        self.new_groups += len(missing)
+
+    def insert_posts(self):
+        """Вставляет посты, кроме тех, чей id уже занят; возвращает их."""
+        records = self.skip_taken_ids(self.pending['post'])
+        Post.objects.bulk_create(
+            [
+                Post(
+                    id=record['id'],
+                    author_id=self.user_ids[record['author']],
+                    group_id=self.group_ids.get(record['group']),
+                    text=record['text'],
+                    created=record['created'],
+                    updated=record['created'],
+                )
+                for record in records
+            ],
+            batch_size=CHUNK_SIZE,
+        )
+        self.inserted['post'] += len(records)
+        if any(record['id'] is not None for record in records):
+            self.explicit_ids = True
+        return records
+
+    def skip_taken_ids(self, records):
+        """Отбрасывает с ошибкой посты с id, занятым в базе или порции.
+
+        Иначе IntegrityError откатил бы всю порцию и остановил импорт.
+        """
+        taken = set(Post.objects.filter(
+            id__in={record['id'] for record in records} - {None}
+        ).values_list('id', flat=True))
+        free = []
+        for record in records:
+            if record['id'] in taken:
+                self.error(record['line'], f'id {record["id"]} уже занят')
+                continue
+            if record['id'] is not None:
+                taken.add(record['id'])
+            free.append(record)
+        return free
+
+    def insert_comments(self):
+        """Вставляет комментарии к существующим постам; возвращает их id."""
+        records = self.pending['comment']
+        existing = set(Post.objects.filter(
+            id__in={record['post'] for record in records}
+        ).values_list('id', flat=True))
+        comments = []
+        for record in records:
+            if record['post'] not in existing:
+                self.error(record['line'], f'нет поста {record["post"]}')
+                continue
+            comments.append(Comment(
+                post_id=record['post'],
+                author_id=self.user_ids[record['author']],
+                text=record['text'],
+                created=record['created'],
+            ))
+        Comment.objects.bulk_create(comments, batch_size=CHUNK_SIZE)
+        self.inserted['comment'] += len(comments)
+        return {comment.post_id for comment in comments}
+
+    def insert_follows(self):
+        """Вставляет новые подписки; считает только действительно новые.
+
+        Повторная подписка не ошибка: уже существующие пары и повторы
+        внутри порции просто пропускаются.
+        """
+        records = self.pending['follow']
+        pairs = {
+            (self.user_ids[record['user']], self.user_ids[record['author']])
+            for record in records
+        }
+        existing = set(Follow.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs},
+            author_id__in={author_id for _, author_id in pairs},
+        ).values_list('user_id', 'author_id'))
+        # ignore_conflicts — на случай подписки, созданной параллельно
+        Follow.objects.bulk_create(
+            [
+                Follow(user_id=user_id, author_id=author_id)
+                for user_id, author_id in pairs - existing
+            ],
+            batch_size=CHUNK_SIZE,
+            ignore_conflicts=True,
+        )
+        self.inserted['follow'] += len(pairs - existing)
+        return records
+
+    def refresh(self, posts, commented, follows):
+        """Делает то, что для одиночных записей делают сигналы.
+
+        Возвращает теги страниц, которые надо сбросить после коммита.
+        """
+        tags = {page_cache.GLOBAL}
+        authors = set()
+        for record in posts:
+            authors.add(record['author'])
+            if record['group'] is not None:
+                tags.add(page_cache.group_tag(record['group']))
+        for record in follows:
+            authors.update((record['user'], record['author']))
+        tags.update(page_cache.author_tag(name) for name in authors)
+        if commented:
+            Post.objects.filter(id__in=commented).update(
+                comments_count=count_subquery(Comment.objects, 'post'),
+                updated=timezone.now(),
+            )
+            for post_id, username, slug in Post.objects.filter(
+                id__in=commented
+            ).values_list('id', 'author__username', 'group__slug'):
+                tags.update((
+                    page_cache.post_tag(post_id),
+                    page_cache.author_tag(username),
+                ))
+                if slug is not None:
+                    tags.add(page_cache.group_tag(slug))
+        self.recount({self.user_ids[name] for name in authors})
+        # Как follower_added для одиночной подписки: до пересборки лент
+        # в finish, чтобы посты популярных авторов туда уже не попали
+        timeline.followers_added(
+            {self.user_ids[record['author']] for record in follows}
+        )
+        posting = {self.user_ids[record['author']] for record in posts}
+        self.timeline_users.update(
+            self.user_ids[record['user']] for record in follows
+        )
+        self.timeline_users.update(Follow.objects.filter(
+            author_id__in=posting
+        ).values_list('user_id', flat=True))
+        return tags
+
+    def recount(self, user_ids):
+        """Пересчитывает счётчики; отсутствующие строки создаст get_stats."""
+        rows = actual_counts(
+            User.objects.filter(id__in=user_ids, stats__isnull=False)
+        ).values_list(
+            'id', 'actual_posts', 'actual_followers', 'actual_following'
+        )
+        UserStats.objects.bulk_update(
+            [
+                UserStats(user_id=user_id, **dict(zip(STATS_FIELDS, counts)))
+                for user_id, *counts in rows
+            ],
+            STATS_FIELDS,
+        )
+
+    def finish(self):
+        """Поиск, ленты подписок и подсказки — один раз на весь импорт."""
+        if self.explicit_ids:
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(
+                    no_style(), [Post]
+                ):
+                    cursor.execute(sql)
+        if self.inserted['post']:
+            with transaction.atomic():
+                search.rebuild()
+        for user_id in self.timeline_users:
+            timeline.rebuild(user_id)
+        if self.new_users:
+            typeahead.users.invalidate()
+        if self.new_groups:
+            typeahead.groups.invalidate()
+
+
+class Command(BaseCommand):
+    help = (
+        'Массово загружает посты, комментарии и подписки из JSONL или CSV '
+        'со старой платформы. Файл читается потоком, записи вставляются '
+        'через bulk_create порциями по транзакции.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл .jsonl или .csv')
+        parser.add_argument(
+            '--format',
+            choices=('jsonl', 'csv'),
+            help='Формат файла (по умолчанию — по расширению)'
+        )
+        parser.add_argument(
+            '--type',
+            choices=KINDS,
+            help='Тип записей без поля type, например для CSV одного типа'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or (
+            'csv' if path.endswith('.csv') else 'jsonl'
+        )
+        importer = Importer(self.report_error)
+        started = time.perf_counter()
+        read = 0
+        try:
+            with imported_timestamps():
+                for number, record in read_records(path, fmt):
+                    read += 1
+                    try:
+                        if fmt == 'jsonl':
+                            record = json.loads(record)
+                        importer.add(number, *clean(record, options['type']))
+                    except (InvalidRecord, ValueError) as error:
+                        importer.error(number, str(error))
+                    if len(importer) == CHUNK_SIZE:
+                        importer.flush()
+                    if read % REPORT_EVERY == 0:
+                        self.report(read, started)
+                importer.flush()
+        except OSError as error:
+            raise CommandError(f'Не удалось прочитать {path}: {error}')
+        finally:
+            # Уже сохранённые порции должны попасть в поиск и ленты,
+            # даже если импорт остановился на ошибке
+            importer.finish()
+        elapsed = time.perf_counter() - started
+        inserted = importer.inserted
+        self.stdout.write(self.style.SUCCESS(
+            f'Постов: {inserted["post"]}, комментариев: '
+            f'{inserted["comment"]}, подписок: {inserted["follow"]}, '
+            f'новых пользователей: {importer.new_users}, групп: '
+            f'{importer.new_groups}, с ошибкой: {importer.errors}. '
+            f'{elapsed:.1f} с, {read / max(elapsed, 1e-9):.0f} строк/с'
+        ))
+
+    def report_error(self, number, message):
+        self.stderr.write(f'Строка {number}: {message}')
+
+    def report(self, read, started):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{read} строк, {read / max(elapsed, 1e-9):.0f} строк/с'
+        )
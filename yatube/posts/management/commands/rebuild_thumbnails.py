@@ -0,0 +1,225 @@
+import multiprocessing
+import os
+import time
+from concurrent import futures
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+from sorl.thumbnail.parsers import parse_geometry
+
+from posts import thumbnails
+from posts.models import Post
+from posts.thumbnail_pool import init_worker, rebuild
+
+BATCH_SIZE = 500
+REPORT_EVERY = 200
+# Настройки, которые процессы пула берут у основного процесса
+WORKER_SETTINGS = ('MEDIA_ROOT',)
+
+
+def iter_images(posts):
+    """Отдаёт (id, изображение) постов порциями по id.
+
+    Каждая порция читается отдельным коротким запросом: открытый на всё
+    время работы курсор держал бы блокировку SQLite и мешал процессам
+    пула записывать миниатюры в хранилище sorl.
+    """
+    last_id = 0
+    while True:
+        batch = list(
+            posts.filter(id__gt=last_id).values_list('id', 'image')[
+                :BATCH_SIZE
+            ]
+        )
+        if not batch:
+            return
+        yield from batch
+        last_id = batch[-1][0]
+
+
+def read_checkpoint(path):
+    try:
+        with open(path) as file:
+            return int(file.read())
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def write_checkpoint(path, post_id):
+    """Пишет контрольную точку через временный файл.
+
+    os.replace атомарен, поэтому прерванный запуск не оставит
+    недописанный файл.
+    """
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'w') as file:
+        file.write(str(post_id))
+    os.replace(temp_path, path)
+
+
+def render_seconds(name):
+    """Время декодирования и сжатия изображения без записи на диск."""
+    backend = thumbnails.PregeneratedThumbnailBackend()
+    source = thumbnails.source_file(name)
+    start = time.perf_counter()
+    image = default.engine.get_image(source)
+    for geometry_string, options in thumbnails.geometries():
+        options = backend.fill_options(source, dict(options))
+        ratio = default.engine.get_image_ratio(image, options)
+        geometry = parse_geometry(geometry_string, ratio)
+        default.engine.create(image, geometry, options)
+    return time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересоздаёт миниатюры всех изображений постов '
+        'в пуле процессов (например, после смены геометрии карточки).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Число процессов пула; 0 — всё в текущем процессе'
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Продолжить с места, где остановился прошлый запуск'
+        )
+        parser.add_argument(
+            '--checkpoint-file',
+            default=os.path.join(
+                settings.BASE_DIR, 'rebuild_thumbnails.checkpoint'
+            ),
+            help='Файл с id последнего обработанного поста'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Ничего не создавать, только оценить время по выборке'
+        )
+        parser.add_argument(
+            '--sample',
+            type=int,
+            default=20,
+            help='Сколько изображений замерить для оценки в --dry-run'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').order_by('id')
+        checkpoint_file = options['checkpoint_file']
+        if options['resume']:
+            checkpoint = read_checkpoint(checkpoint_file)
+            posts = posts.filter(id__gt=checkpoint)
+            self.stdout.write(f'Продолжаем после поста {checkpoint}')
+        total = posts.count()
+        if options['dry_run']:
+            self.estimate(posts, total, options)
+            return
+        started = time.perf_counter()
+        stats = {'done': 0, 'missing': 0, 'failed': 0}
+        busy = 0
+        rows = iter_images(posts)
+        for post_id, name, status, seconds, rendered in self.run(
+            rows, options['workers'], checkpoint_file
+        ):
+            if rendered:
+                thumbnails.record(name, rendered)
+            stats[status] += 1
+            busy += seconds
+            if status == 'failed':
+                self.stderr.write(f'Пост {post_id}: ошибка в {name}')
+            processed = sum(stats.values())
+            if processed % REPORT_EVERY == 0:
+                self.report(processed, total, started)
+        if os.path.exists(checkpoint_file):
+            os.remove(checkpoint_file)
+        elapsed = time.perf_counter() - started
+        processed = sum(stats.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: {stats["done"]}, без исходного файла: '
+            f'{stats["missing"]}, с ошибкой: {stats["failed"]}. '
+            f'{elapsed:.1f} с, {processed / max(elapsed, 1e-9):.1f} '
+            f'изображений/с, в среднем '
+            f'{busy / max(processed, 1) * 1000:.0f} мс на изображение'
+        ))
+
+    def run(self, rows, workers, checkpoint_file):
+        """Прогоняет изображения через пул, держа в работе ограниченное окно.
+
+        ProcessPoolExecutor.map сразу забрал бы весь итератор в память,
+        поэтому задачи отправляются порциями по мере освобождения пула.
+        Контрольная точка — наибольший id, до которого включительно
+        все посты уже обработаны.
+        """
+        if workers == 0:
+            for post_id, name in rows:
+                yield rebuild(post_id, name)
+                write_checkpoint(checkpoint_file, post_id)
+            return
+        window = workers * 4
+        in_flight = {}
+        last_submitted = None
+        # spawn, а не fork: процессы пула не наследуют соединения с базой
+        with futures.ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+            initargs=({
+                name: getattr(settings, name) for name in WORKER_SETTINGS
+            },),
+        ) as executor:
+            rows = iter(rows)
+            while True:
+                for post_id, name in rows:
+                    future = executor.submit(rebuild, post_id, name)
+                    in_flight[future] = post_id
+                    last_submitted = post_id
+                    if len(in_flight) >= window:
+                        break
+                if not in_flight:
+                    return
+                done, _ = futures.wait(
+                    in_flight, return_when=futures.FIRST_COMPLETED
+                )
+                for future in done:
+                    del in_flight[future]
+                    yield future.result()
+                if in_flight:
+                    checkpoint = min(in_flight.values()) - 1
+                else:
+                    checkpoint = last_submitted
+                write_checkpoint(checkpoint_file, checkpoint)
+
+    def report(self, processed, total, started):
+        elapsed = time.perf_counter() - started
+        rate = processed / max(elapsed, 1e-9)
+        eta = (total - processed) / rate if rate else 0
+        self.stdout.write(
+            f'{processed}/{total}: {rate:.1f} изображений/с, '
+            f'осталось ~{eta:.0f} с'
+        )
+
+    def estimate(self, posts, total, options):
+        names = posts.values_list('image', flat=True)[:options['sample']]
+        timings = []
+        for name in names:
+            try:
+                timings.append(render_seconds(name))
+            except Exception:
+                self.stderr.write(f'Не удалось открыть {name}')
+        if not timings:
+            self.stdout.write(f'Изображений к обработке: {total}')
+            return
+        per_image = sum(timings) / len(timings)
+        workers = max(options['workers'], 1)
+        self.stdout.write(self.style.SUCCESS(
+            f'Изображений к обработке: {total}; в среднем '
+            f'{per_image * 1000:.0f} мс на изображение, '
+            f'оценка на {workers} процессах: '
+            f'{per_image * total / workers:.0f} с'
+        ))
@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from posts.models import UserStats
+from posts.stats import actual_counts
+
+User = get_user_model()
+
+FIELDS = ('posts_count', 'followers_count', 'following_count')
+
+
+class Command(BaseCommand):
+    help = 'Сверяет счётчики UserStats с реальными данными и исправляет их.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать расхождения, ничего не исправляя'
+        )
+
+    def handle(self, *args, **options):
+        users = actual_counts(User.objects.all()).values_list(
+            'id',
+            'username',
+            'stats__posts_count',
+            'stats__followers_count',
+            'stats__following_count',
+            'actual_posts',
+            'actual_followers',
+            'actual_following',
+        )
+        drifted = 0
+        for user_id, username, *counts in users.iterator():
+            stored = dict(zip(FIELDS, counts[:3]))
+            actual = dict(zip(FIELDS, counts[3:]))
+            if stored == actual:
+                continue
+            drifted += 1
+            self.stdout.write(
+                f'{username}: сохранено {stored}, на самом деле {actual}'
+            )
+            if not options['dry_run']:
+                UserStats.objects.update_or_create(
+                    user_id=user_id, defaults=actual
+                )
+        if options['dry_run']:
+            message = f'Найдено расхождений: {drifted}'
+        else:
+            message = f'Исправлено расхождений: {drifted}'
+        self.stdout.write(self.style.SUCCESS(message))
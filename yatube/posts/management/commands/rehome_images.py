@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import default
+
+from posts import thumbnails
+from posts.models import Post
+from posts.storage import is_hashed
+
+from .rebuild_thumbnails import iter_images
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит изображения постов, загруженные до хранилища '
+        'по хешу содержимого, в posts/ab/cd/<хеш> и удаляет старые файлы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Ничего не переносить, только посчитать файлы'
+        )
+
+    def handle(self, *args, **options):
+        storage = Post._meta.get_field('image').storage
+        stats = {'moved': 0, 'shared': 0, 'missing': 0}
+        posts = Post.objects.exclude(image='').order_by('id')
+        for post_id, name in iter_images(posts):
+            if is_hashed(name):
+                continue
+            if not storage.exists(name):
+                stats['missing'] += 1
+                continue
+            if options['dry_run']:
+                stats['moved'] += 1
+                continue
+            with storage.open(name) as file:
+                new_name = storage.save(name, file)
+            Post.objects.filter(id=post_id).update(image=new_name)
+            # Миниатюры и закэшированные страницы ссылаются на старое имя
+            thumbnails.generate(new_name)
+            if Post.objects.filter(image=name).exists():
+                # Этот же файл ещё у других постов: удалим с последним
+                stats['shared'] += 1
+                continue
+            default.kvstore.delete(thumbnails.source_file(name))
+            storage.delete(name)
+            stats['moved'] += 1
+        verb = 'К переносу' if options['dry_run'] else 'Перенесено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb}: {stats["moved"]}, общих с другими постами: '
+            f'{stats["shared"]}, без исходного файла: {stats["missing"]}'
+        ))
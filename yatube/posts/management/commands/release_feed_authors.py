@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from posts.models import UserStats
+
+
+class Command(BaseCommand):
+    help = (
+        'Раскладывает по лентам подписок посты авторов, которые больше '
+        'не набирают FEED_FANOUT_THRESHOLD подписчиков (или всех '
+        'подмешиваемых авторов, если FEED_MODE не hybrid).'
+    )
+
+    def handle(self, *args, **options):
+        authors = UserStats.objects.filter(feed_pulled=True)
+        if settings.FEED_MODE == 'hybrid':
+            authors = authors.filter(
+                followers_count__lt=settings.FEED_FANOUT_THRESHOLD
+            )
+        released = 0
+        for author_id in authors.values_list('user_id', flat=True):
+            timeline.release(author_id)
+            released += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Посты разложены по лентам, авторов: {released}'
+        ))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Сверяет Post.comments_count с реальным числом комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать расхождения, ничего не исправляя'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.annotate(
+            actual=Count('comments')
+        ).values_list('id', 'comments_count', 'actual')
+        drifted = 0
+        for post_id, stored, actual in posts.iterator():
+            if stored == actual:
+                continue
+            drifted += 1
+            self.stdout.write(
+                f'Пост {post_id}: сохранено {stored}, на самом деле {actual}'
+            )
+            if not options['dry_run']:
+                Post.objects.filter(pk=post_id).update(comments_count=actual)
+        if options['dry_run']:
+            message = f'Найдено расхождений: {drifted}'
+        else:
+            message = f'Исправлено расхождений: {drifted}'
+        self.stdout.write(self.style.SUCCESS(message))
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:30
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_auto_20220220_1954'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='post',
+            options={'ordering': ['-created', '-id']},
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:36
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_stats(apps, schema_editor):
+    """Считает счётчики для уже существующих пользователей."""
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    Post = apps.get_model('posts', 'Post')
+    Follow = apps.get_model('posts', 'Follow')
+    UserStats = apps.get_model('posts', 'UserStats')
+
+    def count(model, field):
+        counts = model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(total=Count('id')).values('total')
+        return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+    users = User.objects.annotate(
+        actual_posts=count(Post, 'author'),
+        actual_followers=count(Follow, 'author'),
+        actual_following=count(Follow, 'user'),
+    ).values_list(
+        'id', 'actual_posts', 'actual_followers', 'actual_following'
+    )
+    UserStats.objects.bulk_create(
+        (
+            UserStats(
+                user_id=user_id,
+                posts_count=posts,
+                followers_count=followers,
+                following_count=following,
+            )
+            for user_id, posts, followers, following in users.iterator()
+        ),
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('posts', '0016_post_comments_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.PositiveIntegerField(default=0, verbose_name='Постов')),
+                ('followers_count', models.PositiveIntegerField(db_index=True, default=0, verbose_name='Подписчиков')),
+                ('following_count', models.PositiveIntegerField(default=0, verbose_name='Подписок')),
+            ],
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
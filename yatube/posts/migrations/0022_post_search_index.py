@@ -0,0 +1,32 @@
+from django.db import migrations
+
+CREATE_TABLE = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS posts_post_fts USING fts5('
+    "text, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+
+
+def create_index(apps, schema_editor):
+    """Создаёт поисковый индекс FTS5 и заполняет его постами."""
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(CREATE_TABLE)
+        cursor.execute(
+            'INSERT INTO posts_post_fts (rowid, text) SELECT id, '
+            "REPLACE(REPLACE(text, 'ё', 'е'), 'Ё', 'Е') FROM posts_post"
+        )
+
+
+def drop_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute('DROP TABLE IF EXISTS posts_post_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_post_image_storage'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
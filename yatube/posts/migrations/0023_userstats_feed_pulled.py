@@ -0,0 +1,30 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_pulled(apps, schema_editor):
+    """Посты уже популярных авторов по лентам не раскладывались."""
+    if settings.FEED_MODE != 'hybrid':
+        return
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(
+        followers_count__gte=settings.FEED_FANOUT_THRESHOLD
+    ).update(feed_pulled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0022_post_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='feed_pulled',
+            field=models.BooleanField(db_index=True, default=False, verbose_name='Посты подмешиваются при чтении'),
+        ),
+        migrations.RunPython(mark_pulled, migrations.RunPython.noop),
+    ]
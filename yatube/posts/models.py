@@ -1,6 +1,7 @@
 from django.db import models
 from core.models import CreatedModel
 from django.contrib.auth import get_user_model
+from .storage import ContentAddressedStorage
 
 
 class Group(models.Model):
@@ -41,11 +42,62 @@ class Post(CreatedModel):
         'Изображение',
         help_text='Можно добавить картинку',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    # Заполняются при сохранении поста (posts.images.fill_meta), чтобы
+    # разметка карточки не открывала файл; у старых постов — командой
+    # backfill_image_meta
+    image_width = models.PositiveIntegerField(
+        'Ширина изображения',
+        blank=True,
+        null=True,
+        editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота изображения',
+        blank=True,
+        null=True,
+        editable=False
+    )
+    image_placeholder = models.CharField(
+        'Цвет-заглушка изображения',
+        max_length=7,
+        blank=True,
+        editable=False
+    )
+    # Меняется при любой правке поста, его группы или комментариев;
+    # служит версией закэшированной карточки поста
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True
+    )
+    # Счётчик поддерживается сигналами комментариев, чтобы карточки
+    # ленты не делали COUNT(*) по комментариям для каждого поста
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
 
     class Meta:
-        ordering = ['-created']
+        ordering = ['-created', '-id']
+        # Индексы повторяют форму запросов лент: фильтр по автору
+        # или группе и сортировка (created, id) для курсорной паджинации
+        indexes = [
+            models.Index(
+                fields=['-created', '-id'],
+                name='post_created'
+            ),
+            models.Index(
+                fields=['author', '-created', '-id'],
+                name='post_author_created'
+            ),
+            models.Index(
+                fields=['group', '-created', '-id'],
+                name='post_group_created'
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[:CHAR_Q]
@@ -68,6 +120,14 @@ class Comment(CreatedModel):
         help_text='Введите текст комментария'
     )
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='comment_post_created'
+            ),
+        ]
+
     def __str__(self) -> str:
         # выводим текст комментария
         return self.text
@@ -92,3 +152,86 @@ class Follow(models.Model):
                 name='user_author'
             )
         ]
+        # Подписчики автора читаются при раскладке постов по лентам
+        # прямо из индекса, без обращения к таблице
+        indexes = [
+            models.Index(
+                fields=['author', 'user'],
+                name='follow_author'
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя: посты, подписчики и подписки.
+
+    Поддерживаются сигналами, чтобы профиль и страница поста
+    не считали их COUNT(*) на каждый запрос.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Подписчиков',
+        default=0,
+        db_index=True
+    )
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+    # Посты автора подмешиваются в ленты подписок при чтении, а не
+    # раскладываются по ним (см. posts.timeline). Флаг ставится, когда
+    # подписчиков становится много, и снимается только вместе
+    # с раскладкой постов по лентам, чтобы они не пропадали из лент
+    feed_pulled = models.BooleanField(
+        'Посты подмешиваются при чтении',
+        default=False,
+        db_index=True
+    )
+
+    def __str__(self) -> str:
+        return f'Статистика {self.user}'
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписчика.
+
+    Хранит копию даты создания поста, чтобы лента читалась одним
+    диапазоном по индексу (user, created, post) без join и сортировки.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    created = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='timeline_user_post'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-created', '-post'],
+                name='timeline_user_created'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author'
+            ),
+        ]
@@ -0,0 +1,104 @@
+"""Кэш страниц с инвалидацией по тегам.
+
+Каждая закэшированная страница помечена тегами того, что на ней показано:
+вся лента (GLOBAL), группа, автор, пост. У каждого тега в кэше хранится
+текущая версия, и версии тегов страницы входят в ключ cache_page.
+Запись в базу меняет версии затронутых тегов, после чего старые страницы
+больше не находятся и сами вытесняются из кэша по таймауту.
+
+Страница зависит и от того, кто её смотрит: шапка, кнопки автора,
+подписка, CSRF-токен формы комментария. Поэтому ключ учитывает
+заголовок Cookie (сессию и CSRF-cookie), и гости без cookie делят
+одну копию, а у каждого вошедшего пользователя она своя.
+"""
+import hashlib
+import uuid
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from django.views.decorators.cache import cache_page
+from django.views.decorators.vary import vary_on_cookie
+
+from .models import Post
+
+GLOBAL = 'global'
+
+
+def group_tag(slug) -> str:
+    return f'group:{slug}'
+
+
+def author_tag(username) -> str:
+    return f'author:{username}'
+
+
+def post_tag(post_id) -> str:
+    return f'post:{post_id}'
+
+
+def version_key(tag) -> str:
+    return f'page_cache:version:{tag}'
+
+
+def tags_for_post(post_id):
+    """Теги страниц, на которых виден пост, кроме общей ленты."""
+    tags = [post_tag(post_id)]
+    row = Post.objects.filter(id=post_id).values_list(
+        'author__username', 'group__slug'
+    ).first()
+    if row is not None:
+        username, slug = row
+        tags.append(author_tag(username))
+        if slug is not None:
+            tags.append(group_tag(slug))
+    return tags
+
+
+def versions(tags):
+    """Возвращает текущие версии тегов, заводя недостающие."""
+    keys = [version_key(tag) for tag in tags]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, uuid.uuid4().hex, None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def bump(tags):
+    cache.set_many(
+        {version_key(tag): uuid.uuid4().hex for tag in tags}, None
+    )
+
+
+def invalidate(*tags):
+    """Сбрасывает страницы с любым из тегов.
+
+    Версии меняются сразу и ещё раз после коммита транзакции: иначе
+    параллельный запрос мог бы между ними закэшировать старые данные
+    под уже новой версией.
+    """
+    tags = set(tags)
+    bump(tags)
+    transaction.on_commit(lambda: bump(tags))
+
+
+def cache_tagged(timeout, tags):
+    """Кэширует страницу view под версиями тегов tags(request, **kwargs).
+
+    Vary: Cookie ставится внутри cache_page: SessionMiddleware
+    и CsrfViewMiddleware добавляют его уже после того, как cache_page
+    сохранил ответ, и страница одного пользователя доставалась бы всем.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            page_versions = versions(tags(request, *args, **kwargs))
+            prefix = hashlib.md5(':'.join(page_versions).encode()).hexdigest()
+            cached_view = cache_page(timeout, key_prefix=prefix)(
+                vary_on_cookie(view)
+            )
+            return cached_view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,274 @@
+import datetime
+import hashlib
+import heapq
+import threading
+import time
+
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
+from django.db import connections
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = datetime.timedelta(microseconds=1)
+# Сколько секунд число записей считается свежим и сколько хранится в кэше
+COUNT_REFRESH_AFTER = 60
+COUNT_CACHE_TIMEOUT = 60 * 60
+# Границы целого в SQLite: число за ними в запросе — OverflowError
+MIN_INT = -2 ** 63
+MAX_INT = 2 ** 63 - 1
+
+
+def encode_cursor(created, pk) -> str:
+    """Превращает пару (дата создания, id) в токен для URL."""
+    return f'{(created - EPOCH) // MICROSECOND}_{pk}'
+
+
+def db_int(value) -> int:
+    """Целое, которое поместится в столбец базы; иначе ValueError."""
+    number = int(value)
+    if not MIN_INT <= number <= MAX_INT:
+        raise ValueError(f'{value} вне диапазона целых базы')
+    return number
+
+
+def decode_cursor(token):
+    """Разбирает токен курсора; для испорченного токена возвращает None."""
+    try:
+        microseconds, pk = token.split('_')
+        return EPOCH + int(microseconds) * MICROSECOND, db_int(pk)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+class CursorPaginator(Paginator):
+    """Паджинатор по ключу (created, id).
+
+    В отличие от обычного Paginator не делает ни OFFSET, ни COUNT(*):
+    страница начинается сразу за курсором ?before= (более старые записи)
+    или ?after= (более новые), поэтому глубокие страницы стоят столько же,
+    сколько первая. Общее число страниц неизвестно, поэтому number
+    и num_pages описывают только соседей текущей страницы — этого
+    достаточно для has_next/has_previous у обычного Page.
+    """
+
+    def __init__(self, object_list, per_page, keys=('created', 'id')):
+        super().__init__(object_list, per_page)
+        self.keys = keys
+        self.number = 1
+        self.has_next = False
+
+    def _check_object_list_is_ordered(self):
+        # Порядок задаёт сам паджинатор по полям keys
+        pass
+
+    @property
+    def count(self):
+        return self.number * self.per_page
+
+    @property
+    def num_pages(self):
+        return self.number + 1 if self.has_next else self.number
+
+    def get_page(self, before=None, after=None):
+        """Возвращает страницу записей старее before или новее after."""
+        before = decode_cursor(before) if before else None
+        after = decode_cursor(after) if after else None
+        if after is not None:
+            rows = self._fetch(after, newer=True)
+            if len(rows) > self.per_page:
+                return self._make_page(rows[:self.per_page][::-1], True, True)
+            # Дошли до самых свежих записей: показываем полную первую
+            # страницу, а не её огрызок.
+        elif before is not None:
+            rows = self._fetch(before)
+            return self._make_page(
+                rows[:self.per_page], len(rows) > self.per_page, True
+            )
+        rows = self._fetch()
+        return self._make_page(
+            rows[:self.per_page], len(rows) > self.per_page, False
+        )
+
+    def get_more(self, cursor=None, ascending=False):
+        """Следующая порция записей за cursor для подгрузки «Показать ещё».
+
+        В отличие от get_page идёт только в одну сторону: от новых к старым
+        или, при ascending, от старых к новым.
+        """
+        cursor = decode_cursor(cursor) if cursor else None
+        rows = self._fetch(cursor, newer=ascending)
+        return self._make_page(
+            rows[:self.per_page], len(rows) > self.per_page, cursor is not None
+        )
+
+    def _fetch(self, cursor=None, newer=False):
+        """Читает per_page + 1 записей за курсором одним range-запросом."""
+        time_key, id_key = self.keys
+        queryset = self.object_list
+        if newer:
+            ordering = (time_key, id_key)
+        else:
+            ordering = ('-' + time_key, '-' + id_key)
+        if cursor is not None:
+            created, pk = cursor
+            # Условие записано как диапазон по времени плюс исключение
+            # граничных строк, чтобы база шла по индексу от курсора,
+            # а не проверяла OR для каждой строки с начала индекса.
+            lookup, id_lookup = ('gte', 'lte') if newer else ('lte', 'gte')
+            queryset = queryset.filter(
+                **{f'{time_key}__{lookup}': created}
+            ).exclude(
+                **{time_key: created, f'{id_key}__{id_lookup}': pk}
+            )
+        return list(queryset.order_by(*ordering)[:self.per_page + 1])
+
+    def _make_page(self, rows, has_next, has_previous):
+        self.number = 2 if has_previous else 1
+        self.has_next = has_next
+        page = Page(rows, self.number, self)
+        page.previous_cursor = (
+            self.cursor_for(rows[0]) if has_previous and rows else ''
+        )
+        page.next_cursor = self.cursor_for(rows[-1]) if has_next else ''
+        return page
+
+    def key_for(self, obj):
+        time_key, id_key = self.keys
+        return getattr(obj, time_key), getattr(obj, id_key)
+
+    def cursor_for(self, obj) -> str:
+        return encode_cursor(*self.key_for(obj))
+
+
+class ValuesCursorPaginator(CursorPaginator):
+    """CursorPaginator для queryset.values(): записи — словари."""
+
+    def key_for(self, obj):
+        time_key, id_key = self.keys
+        return obj[time_key], obj[id_key]
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """Сливает несколько курсорных источников в одну ленту.
+
+    Каждый источник отдаёт не больше per_page + 1 записей за курсором,
+    а итоговая страница собирается k-way слиянием через heapq.merge.
+    Источники должны отдавать объекты с одинаковыми полями keys;
+    повторы одного и того же объекта выкидываются.
+    """
+
+    def __init__(self, sources, per_page, keys=('created', 'id')):
+        super().__init__(sources, per_page, keys)
+        self.sources = sources
+
+    def _fetch(self, cursor=None, newer=False):
+        streams = [
+            [(self.key_for(obj), obj) for obj in source._fetch(cursor, newer)]
+            for source in self.sources
+        ]
+        merged = heapq.merge(
+            *streams, key=lambda item: item[0], reverse=not newer
+        )
+        rows = []
+        last_key = None
+        for key, obj in merged:
+            if key == last_key:
+                continue
+            last_key = key
+            rows.append(obj)
+            if len(rows) > self.per_page:
+                break
+        return rows
+
+
+class CachedCountPaginator(Paginator):
+    """Нумерованный паджинатор с закэшированным числом записей.
+
+    COUNT(*) выполняется один раз на форму запроса и хранится в кэше;
+    устаревшее значение отдаётся сразу, а пересчитывается в фоновом
+    потоке. Вместо всех номеров страниц шаблону отдаётся окно вокруг
+    текущей страницы плюс первая и последняя (page_window).
+    """
+    ELLIPSIS = '…'
+
+    @cached_property
+    def count(self):
+        key = self.count_cache_key()
+        cached = cache.get(key)
+        if cached is None:
+            return self.refresh_count(key)
+        count, counted_at = cached
+        if time.time() - counted_at > COUNT_REFRESH_AFTER:
+            # Пересчёт запускает только тот запрос, который взял блокировку
+            if cache.add(f'{key}:lock', True, COUNT_REFRESH_AFTER):
+                threading.Thread(
+                    target=self.refresh_in_background, args=(key,),
+                    daemon=True,
+                ).start()
+        return count
+
+    def count_cache_key(self) -> str:
+        query = str(getattr(self.object_list, 'query', self.object_list))
+        return 'paginator:count:' + hashlib.md5(query.encode()).hexdigest()
+
+    def refresh_count(self, key):
+        count = super().count
+        cache.set(key, (count, time.time()), COUNT_CACHE_TIMEOUT)
+        return count
+
+    def refresh_in_background(self, key):
+        try:
+            self.refresh_count(key)
+        finally:
+            cache.delete(f'{key}:lock')
+            connections.close_all()
+
+    def get_elided_page_range(self, number=1, on_each_side=2, on_ends=1):
+        """Номера страниц вокруг number, первые и последние on_ends."""
+        number = self.validate_number(number)
+        if self.num_pages <= (on_each_side + on_ends + 1) * 2:
+            return list(self.page_range)
+        window = []
+        if number > on_each_side + on_ends + 1:
+            window.extend(range(1, on_ends + 1))
+            window.append(self.ELLIPSIS)
+            window.extend(range(number - on_each_side, number + 1))
+        else:
+            window.extend(range(1, number + 1))
+        if number < self.num_pages - on_each_side - on_ends:
+            window.extend(range(number + 1, number + on_each_side + 1))
+            window.append(self.ELLIPSIS)
+            window.extend(
+                range(self.num_pages - on_ends + 1, self.num_pages + 1)
+            )
+        else:
+            window.extend(range(number + 1, self.num_pages + 1))
+        return window
+
+    def _get_page(self, *args, **kwargs):
+        page = super()._get_page(*args, **kwargs)
+        page.page_window = self.get_elided_page_range(page.number)
+        return page
+
+
+def paginate(request, object_list, per_page, keys=('created', 'id')):
+    """Возвращает страницу ленты по параметрам ?before=/?after= запроса.
+
+    Старые ссылки вида ?page=N продолжают работать через нумерованный
+    паджинатор с закэшированным числом записей.
+    """
+    if 'page' in request.GET:
+        paginator = CachedCountPaginator(object_list, per_page)
+        return paginator.get_page(request.GET['page'])
+    return get_page(request, CursorPaginator(object_list, per_page, keys))
+
+
+def get_page(request, paginator):
+    """Возвращает страницу готового паджинатора по курсору из запроса."""
+    return paginator.get_page(
+        before=request.GET.get('before'),
+        after=request.GET.get('after'),
+    )
@@ -0,0 +1,209 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Текст постов копируется в виртуальную таблицу posts_post_fts (rowid равен
+id поста) с токенизатором unicode61, который приводит к нижнему регистру
+и кириллицу. Буква «ё» заменяется на «е» и в индексе, и в запросе.
+Русских окончаний FTS5 не знает, поэтому у слов запроса отрезается
+типичное окончание, а основа ищется как префикс («котами» находит
+«кот», «коты» и «котик»). Индекс обновляется сигналами сохранения
+и удаления поста; после массовых правок в обход ORM его пересобирает
+команда rebuild_search_index.
+"""
+import re
+from collections import namedtuple
+
+from django.core.paginator import Page
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+from .models import Group, Post, User
+from .paginator import db_int
+
+# Создаётся миграцией 0022_post_search_index
+TABLE = 'posts_post_fts'
+FACETS_QUANTITY = 10
+# Окончания от длинных к коротким; отрезается первое подходящее,
+# если основа остаётся не короче MIN_STEM букв
+ENDINGS = (
+    'иями', 'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими',
+    'ая', 'яя', 'ое', 'ее', 'ой', 'ей', 'ий', 'ый', 'ые', 'ие', 'ов',
+    'ев', 'ах', 'ях', 'ом', 'ем', 'ам', 'ям', 'а', 'я', 'ы', 'и', 'е',
+    'о', 'у', 'ю', 'ь',
+)
+MIN_STEM = 3
+
+Facet = namedtuple('Facet', ('value', 'label', 'count'))
+
+
+def normalize(text) -> str:
+    return text.replace('ё', 'е').replace('Ё', 'Е')
+
+
+def stem(word) -> str:
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def to_match(query) -> str:
+    """Запрос пользователя в выражение MATCH: все основы как префиксы.
+
+    Кавычки вокруг основ не дают словам вроде AND или NEAR стать
+    операторами FTS5. Для запроса без слов возвращает пустую строку.
+    """
+    words = re.findall(r'\w+', normalize(query).lower())
+    return ' '.join(f'"{stem(word)}"*' for word in words)
+
+
+def matching_ids(query):
+    """Подзапрос id постов, подходящих под запрос, для фильтра id__in."""
+    return RawSQL(
+        f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s', [to_match(query)]
+    )
+
+
+def index_post(post_id, text):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT OR REPLACE INTO {TABLE} (rowid, text) VALUES (%s, %s)',
+            [post_id, normalize(text)],
+        )
+
+
+def unindex_post(post_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild():
+    """Заново заполняет индекс всеми постами и сжимает его."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, text) SELECT id, '
+            "REPLACE(REPLACE(text, 'ё', 'е'), 'Ё', 'Е') FROM posts_post"
+        )
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+
+
+def encode_cursor(rank, pk) -> str:
+    return f'{rank!r}_{pk}'
+
+
+def decode_cursor(token):
+    try:
+        rank, pk = token.split('_')
+        return float(rank), db_int(pk)
+    except (AttributeError, ValueError):
+        return None
+
+
+class SearchPaginator:
+    """Страницы результатов поиска по ключу (релевантность, id).
+
+    Как и CursorPaginator, не делает ни OFFSET, ни COUNT(*): следующая
+    страница начинается за курсором ?after= и идёт только вперёд.
+    """
+
+    def __init__(self, query, per_page, group_id=None, author_id=None):
+        self.match = to_match(query)
+        self.per_page = per_page
+        self.filters = {'group_id': group_id, 'author_id': author_id}
+        self.number = 1
+        self.has_next = False
+
+    @property
+    def count(self):
+        return self.number * self.per_page
+
+    @property
+    def num_pages(self):
+        return self.number + 1 if self.has_next else self.number
+
+    def where(self, exclude=None):
+        """Условия фильтров по группе и автору, кроме exclude."""
+        sql, params = [], []
+        for column, value in self.filters.items():
+            if value is not None and column != exclude:
+                sql.append(f'AND p.{column} = %s')
+                params.append(value)
+        return ' '.join(sql), params
+
+    def get_page(self, after=None):
+        cursor = decode_cursor(after) if after else None
+        rows = self._fetch(cursor) if self.match else []
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [pk for pk, _ in rows[:self.per_page]]
+        )
+        results = []
+        for pk, rank in rows[:self.per_page]:
+            if pk in posts:
+                posts[pk].rank = rank
+                results.append(posts[pk])
+        self.number = 2 if cursor else 1
+        self.has_next = len(rows) > self.per_page
+        page = Page(results, self.number, self)
+        page.next_cursor = (
+            encode_cursor(*rows[self.per_page - 1][::-1])
+            if self.has_next else ''
+        )
+        return page
+
+    def _fetch(self, cursor):
+        """per_page + 1 пар (id, релевантность) за курсором.
+
+        bm25 тем меньше, чем пост релевантнее, поэтому сортировка
+        по возрастанию.
+        """
+        where, params = self.where()
+        if cursor is not None:
+            rank, pk = cursor
+            where += (
+                ' AND (hits.rank > %s OR (hits.rank = %s AND hits.id > %s))'
+            )
+            params += [rank, rank, pk]
+        with connection.cursor() as db:
+            db.execute(
+                f'SELECT hits.id, hits.rank FROM ('
+                f'SELECT rowid AS id, bm25({TABLE}) AS rank FROM {TABLE} '
+                f'WHERE {TABLE} MATCH %s) AS hits '
+                f'JOIN posts_post p ON p.id = hits.id '
+                f'WHERE 1 {where} ORDER BY hits.rank, hits.id LIMIT %s',
+                [self.match, *params, self.per_page + 1],
+            )
+            return db.fetchall()
+
+    def facets(self, column, model, label):
+        """Самые частые значения column среди найденных постов.
+
+        Счётчики учитывают остальные фильтры, но не фильтр по column.
+        """
+        if not self.match:
+            return []
+        where, params = self.where(exclude=column)
+        with connection.cursor() as db:
+            db.execute(
+                f'SELECT p.{column}, COUNT(*) FROM {TABLE} '
+                f'JOIN posts_post p ON p.id = {TABLE}.rowid '
+                f'WHERE {TABLE} MATCH %s AND p.{column} IS NOT NULL {where} '
+                f'GROUP BY p.{column} ORDER BY COUNT(*) DESC, p.{column} '
+                f'LIMIT %s',
+                [self.match, *params, FACETS_QUANTITY],
+            )
+            counts = db.fetchall()
+        objects = model.objects.in_bulk([value for value, _ in counts])
+        return [
+            Facet(objects[value], label(objects[value]), count)
+            for value, count in counts
+            if value in objects
+        ]
+
+    def group_facets(self):
+        return self.facets('group_id', Group, str)
+
+    def author_facets(self):
+        return self.facets(
+            'author_id', User,
+            lambda user: user.get_full_name() or user.username,
+        )
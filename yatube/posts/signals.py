@@ -0,0 +1,223 @@
+import threading
+
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete, post_init, post_save, pre_delete, pre_save
+)
+from django.core.signals import request_finished
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import (
+    images, page_cache, search, stats, thumbnails, timeline, typeahead
+)
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+USER_SUGGESTION_FIELDS = {'username', 'first_name', 'last_name'}
+
+# id постов, которые этот поток сейчас удаляет вместе с комментариями
+_deleting = threading.local()
+
+
+def deleting_posts():
+    if not hasattr(_deleting, 'post_ids'):
+        _deleting.post_ids = set()
+    return _deleting.post_ids
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, update_fields=None,
+               **kwargs):
+    """Заводит счётчики новому пользователю и обновляет подсказки."""
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+    # Вход сохраняет только last_login, подсказки от него не меняются
+    if update_fields is None or USER_SUGGESTION_FIELDS & set(update_fields):
+        typeahead.users.update_user(instance)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    typeahead.users.remove(instance.pk)
+
+
+@receiver(post_init, sender=Post)
+def post_loaded(sender, instance, **kwargs):
+    """Запоминает изображение, к которому относятся размеры в строке."""
+    remember_described_image(instance)
+
+
+def remember_described_image(post):
+    # Через __dict__: отложенные only()/defer() поля не догружаются
+    image = post.__dict__.get('image')
+    if image and post.__dict__.get('image_placeholder'):
+        post._described_image = str(image)
+    else:
+        post._described_image = None
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, raw=False, **kwargs):
+    """Описывает новое изображение и запоминает страницы до правки."""
+    if raw:
+        return
+    images.fill_meta(instance)
+    if instance.pk is not None:
+        instance._old_page_tags = page_cache.tags_for_post(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, update_fields=None,
+               **kwargs):
+    """Учитывает новый пост у автора и раскладывает его по лентам."""
+    # Загруженный файл теперь сохранён под окончательным именем
+    remember_described_image(instance)
+    if created:
+        # id мог остаться от удаления, которое откатилось
+        deleting_posts().discard(instance.pk)
+        stats.bump(instance.author_id, posts_count=1)
+        timeline.fan_out(instance)
+    if update_fields is None or 'text' in update_fields:
+        search.index_post(instance.pk, instance.text)
+    if not raw:
+        page_cache.invalidate(
+            page_cache.GLOBAL,
+            *page_cache.tags_for_post(instance.pk),
+            *getattr(instance, '_old_page_tags', ()),
+        )
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    """Сбрасывает страницы, где был виден удаляемый пост.
+
+    Его комментарии удаляются каскадом следом, и comment_deleted
+    пропускает их: считать и сбрасывать для удаляемого поста нечего.
+    """
+    deleting_posts().add(instance.pk)
+    page_cache.invalidate(
+        page_cache.GLOBAL, *page_cache.tags_for_post(instance.pk)
+    )
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    """Уменьшает счётчик постов автора и убирает пост из поиска."""
+    deleting_posts().discard(instance.pk)
+    stats.bump(instance.author_id, posts_count=-1)
+    search.unindex_post(instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    """Учитывает подписку в счётчиках и наполняет ленту подписчика."""
+    if created:
+        stats.bump(instance.user_id, following_count=1)
+        stats.bump(instance.author_id, followers_count=1)
+        timeline.follower_added(instance.author_id)
+        timeline.backfill(instance.user_id, instance.author_id)
+        invalidate_profiles(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    """Учитывает отписку в счётчиках и чистит ленту подписчика."""
+    stats.bump(instance.user_id, following_count=-1)
+    stats.bump(instance.author_id, followers_count=-1)
+    timeline.remove(instance.user_id, instance.author_id)
+    invalidate_profiles(instance)
+
+
+def invalidate_profiles(follow):
+    """Сбрасывает профили обоих участников подписки."""
+    page_cache.invalidate(
+        page_cache.author_tag(follow.user.username),
+        page_cache.author_tag(follow.author.username),
+    )
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    """Увеличивает счётчик комментариев и версию карточки поста."""
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F('comments_count') + 1,
+            updated=timezone.now(),
+        )
+        page_cache.invalidate(
+            page_cache.GLOBAL, *page_cache.tags_for_post(instance.post_id)
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    """Уменьшает счётчик комментариев и обновляет версию карточки поста."""
+    if instance.post_id in deleting_posts():
+        return
+    Post.objects.filter(pk=instance.post_id, comments_count__gt=0).update(
+        comments_count=F('comments_count') - 1,
+        updated=timezone.now(),
+    )
+    page_cache.invalidate(
+        page_cache.GLOBAL, *page_cache.tags_for_post(instance.post_id)
+    )
+
+
+@receiver(pre_save, sender=Group)
+def group_saving(sender, instance, raw=False, **kwargs):
+    """Запоминает прежний адрес группы."""
+    if instance.pk is not None and not raw:
+        instance._old_slug = Group.objects.filter(
+            pk=instance.pk
+        ).values_list('slug', flat=True).first()
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, **kwargs):
+    """Сбрасывает карточки постов и страницы изменённой группы."""
+    typeahead.groups.update_group(instance)
+    if not created:
+        instance.posts.update(updated=timezone.now())
+        old_slug = getattr(instance, '_old_slug', instance.slug)
+        page_cache.invalidate(
+            page_cache.GLOBAL,
+            page_cache.group_tag(instance.slug),
+            page_cache.group_tag(old_slug),
+            *group_author_tags(instance),
+        )
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    """Сбрасывает карточки и страницы постов, которые останутся без группы."""
+    instance.posts.update(updated=timezone.now())
+    page_cache.invalidate(
+        page_cache.GLOBAL,
+        page_cache.group_tag(instance.slug),
+        *group_author_tags(instance),
+    )
+
+
+@receiver(post_delete, sender=Group)
+def group_removed(sender, instance, **kwargs):
+    typeahead.groups.remove(instance.pk)
+
+
+def group_author_tags(group):
+    """Теги профилей авторов, у которых есть посты в группе."""
+    # order_by() убирает сортировку модели, иначе distinct учтёт и её поля
+    usernames = group.posts.order_by().values_list(
+        'author__username', flat=True
+    ).distinct()
+    return [page_cache.author_tag(username) for username in usernames]
+
+
+@receiver(request_finished)
+def request_done(sender, **kwargs):
+    """Сбрасывает данные запроса о миниатюрах.
+
+    Если задан THUMBNAIL_UPLOAD_WAIT, ещё и ждёт миниатюр загруженных
+    в запросе изображений.
+    """
+    thumbnails.forget_prefetched()
+    thumbnails.wait_scheduled()
@@ -0,0 +1,64 @@
+"""Поддержка счётчиков UserStats.
+
+Счётчики меняются F-выражениями, поэтому параллельные запросы
+не теряют обновлений. Если строки статистики ещё нет, обновление
+пропускается: её создаст get_stats при первом чтении или команда
+reconcile_user_stats.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Follow, Post, UserStats
+
+
+def bump(user_id, **deltas):
+    """Сдвигает счётчики пользователя на заданные величины."""
+    # Счётчики беззнаковые: уменьшаем только те, что не уйдут в минус
+    guards = {
+        f'{field}__gte': -delta
+        for field, delta in deltas.items() if delta < 0
+    }
+    UserStats.objects.filter(user_id=user_id, **guards).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+
+
+def count_subquery(queryset, field):
+    """Подзапрос COUNT(*) для связанной таблицы по полю field."""
+    counts = queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+        field
+    ).annotate(total=Count('id')).values('total')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def actual_counts(users):
+    """Добавляет к пользователям реальные значения счётчиков."""
+    return users.annotate(
+        actual_posts=count_subquery(Post.objects, 'author'),
+        actual_followers=count_subquery(Follow.objects, 'author'),
+        actual_following=count_subquery(Follow.objects, 'user'),
+    )
+
+
+def recount(user):
+    """Пересчитывает и сохраняет счётчики пользователя."""
+    actual = actual_counts(
+        type(user).objects.filter(pk=user.pk)
+    ).values('actual_posts', 'actual_followers', 'actual_following').get()
+    stats, _ = UserStats.objects.update_or_create(
+        user=user,
+        defaults={
+            'posts_count': actual['actual_posts'],
+            'followers_count': actual['actual_followers'],
+            'following_count': actual['actual_following'],
+        },
+    )
+    return stats
+
+
+def get_stats(user):
+    """Возвращает счётчики пользователя, создавая их при необходимости."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return recount(user)
@@ -0,0 +1,75 @@
+"""Хранилище изображений постов с именами по содержимому.
+
+Файл называется SHA-256 своего содержимого и раскладывается по вложенным
+каталогам из первых символов хеша: posts/ab/cd/abcd…ef.jpg. Каталоги
+остаются небольшими при любом числе файлов, одинаковые картинки хранятся
+один раз, а содержимое файла по данному имени никогда не меняется, поэтому
+его можно отдавать с вечным кэшированием.
+"""
+import hashlib
+import os
+import posixpath
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+# Два уровня каталогов по два символа хеша: 65536 листовых каталогов
+SHARD_DEPTH = 2
+SHARD_WIDTH = 2
+
+HASHED_NAME = re.compile(
+    r'(?:^|/)' + r'[0-9a-f]{%d}/' % SHARD_WIDTH * SHARD_DEPTH
+    + r'[0-9a-f]{64}(?:\.\w+)?$'
+)
+
+
+def content_hash(content) -> str:
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hashed_name(name, digest) -> str:
+    """Имя по хешу в том же каталоге, что и name, с его расширением."""
+    directory, filename = posixpath.split(name)
+    extension = posixpath.splitext(filename)[1].lower()
+    shards = [
+        digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH]
+        for i in range(SHARD_DEPTH)
+    ]
+    return posixpath.join(directory, *shards, digest + extension)
+
+
+def is_hashed(name) -> bool:
+    return HASHED_NAME.search(name) is not None
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage, который сохраняет файл под хешем содержимого.
+
+    Если такой файл уже есть, он не перезаписывается, а его имя
+    возвращается для нового поста. Время изменения файла при этом
+    обновляется: gc_media не трогает свежие файлы, поэтому не удалит
+    картинку, которая досталась новому посту, пока шла сборка мусора.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = hashed_name(name, content_hash(content))
+        if self.exists(name):
+            try:
+                os.utime(self.path(name))
+                return name
+            except FileNotFoundError:
+                # gc_media успел удалить файл: сохраняем заново
+                pass
+        # Одновременная загрузка той же картинки может успеть раньше;
+        # тогда FileSystemStorage сохранит копию с суффиксом в имени
+        return super().save(name, content, max_length)
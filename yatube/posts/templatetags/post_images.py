@@ -0,0 +1,31 @@
+from django import template
+from sorl.thumbnail import default
+
+from .. import thumbnails
+
+register = template.Library()
+
+
+@register.inclusion_tag('posts/includes/post_image.html')
+def post_image(post, sizes, above_fold=False):
+    """Картинка поста со всеми готовыми ширинами миниатюр в srcset.
+
+    Картинки ниже первого экрана (above_fold=False) грузятся лениво.
+    """
+    images = [
+        default.backend.get_thumbnail(post.image, geometry, **options)
+        for geometry, options in thumbnails.geometries()
+    ]
+    ready = [
+        image for image in images
+        if not isinstance(image, thumbnails.Placeholder)
+    ]
+    return {
+        'post': post,
+        # Пока ни одной миниатюры нет, показывается заглушка
+        # самого большого размера
+        'src': ready[-1] if ready else images[-1],
+        'srcset': ', '.join(f'{image.url} {image.x}w' for image in ready),
+        'sizes': sizes,
+        'lazy': not above_fold,
+    }
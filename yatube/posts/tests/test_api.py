@@ -0,0 +1,123 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Group, Post
+
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(
+            title='Заметки', slug='notes', description='Разное'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author,
+                group=cls.group if number % 2 else None,
+                text=f'Пост номер {number}',
+            )
+            for number in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_default_fields(self):
+        """Лента отдаёт поля по умолчанию, свежие посты первыми."""
+        response = self.client.get(reverse('posts:api_index'))
+        first = response.json()['results'][0]
+        self.assertEqual(first['id'], self.posts[-1].id)
+        self.assertEqual(first['author'], 'writer')
+        self.assertIsNone(first['image'])
+        self.assertNotIn('updated', first)
+
+    def test_sparse_fields(self):
+        """fields= ограничивает и ответ, и колонки запроса."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('posts:api_index'), {'fields': 'id,author'}
+            )
+        self.assertEqual(
+            response.json()['results'][0],
+            {'id': self.posts[-1].id, 'author': 'writer'},
+        )
+        select = [
+            query['sql'] for query in queries.captured_queries
+            if 'FROM "posts_post"' in query['sql']
+        ][-1]
+        self.assertNotIn('"text"', select)
+        response = self.client.get(
+            reverse('posts:api_index'), {'fields': 'id,password'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('password', response.json()['error'])
+
+    def test_cursor_walk(self):
+        """Ссылки next проходят всю ленту без повторов."""
+        url = reverse('posts:api_group_posts', kwargs={'slug': 'notes'})
+        seen = []
+        link = '?limit=1&fields=id'
+        while link:
+            data = self.client.get(url + link).json()
+            seen.extend(item['id'] for item in data['results'])
+            link = data['next']
+        self.assertEqual(seen, [self.posts[3].id, self.posts[1].id])
+
+    def test_batch_by_ids(self):
+        """ids= отдаёт посты в порядке запроса одним запросом к постам."""
+        ids = [self.posts[0].id, self.posts[4].id, 0]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('posts:api_index'),
+                {'ids': ','.join(map(str, ids)), 'fields': 'id'},
+            )
+        self.assertEqual(
+            response.json()['results'],
+            [{'id': self.posts[0].id}, {'id': self.posts[4].id}],
+        )
+        self.assertEqual(
+            sum('FROM "posts_post"' in query['sql']
+                for query in queries.captured_queries),
+            1,
+        )
+
+    def test_out_of_range_numbers(self):
+        """Слишком большие id и испорченные курсоры — 400, а не 500."""
+        huge = '9' * 20
+        for params in (
+            {'ids': huge},
+            {'before': f'1_{huge}'},
+            {'after': f'{huge}_1'},
+            {'before': 'garbage'},
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(
+                    reverse('posts:api_index'), params
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+    def test_detail_and_not_found(self):
+        """Пост отдаётся по id, неизвестные пост и автор — 404 в JSON."""
+        post = self.posts[0]
+        response = self.client.get(
+            reverse('posts:api_post', kwargs={'post_id': post.id}),
+            {'fields': 'text'},
+        )
+        self.assertEqual(response.json(), {'text': post.text})
+        for url in (
+            reverse('posts:api_post', kwargs={'post_id': 0}),
+            reverse('posts:api_profile_posts', kwargs={'username': 'ghost'}),
+        ):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 404)
+            self.assertIn('error', response.json())
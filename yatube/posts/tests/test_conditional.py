@@ -0,0 +1,101 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils.http import http_date
+
+from ..models import Comment, Follow, Group, Post
+
+
+User = get_user_model()
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.pages = [
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:group_list', kwargs={'slug': 'group'}),
+        ]
+
+    def revalidate(self, url, response, client=None):
+        return (client or Client()).get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+
+    def test_not_modified_without_rendering(self):
+        """Совпавший ETag даёт 304 одним запросом, без шаблонов."""
+        for url in self.pages:
+            with self.subTest(url=url):
+                response = Client().get(url)
+                self.assertNotIn('Last-Modified', response)
+                with self.assertNumQueries(1):
+                    again = self.revalidate(url, response)
+                self.assertEqual(again.status_code, 304)
+                self.assertEqual(again.templates, [])
+
+    def test_if_modified_since_after_delete(self):
+        """If-Modified-Since не даёт 304 на страницу после удаления поста.
+
+        Самая свежая правка при удалении не меняется, поэтому дата
+        для проверки не годится.
+        """
+        extra = Post.objects.create(
+            author=self.author, group=self.group, text='Удалят'
+        )
+        since = http_date(time.time() + 60)
+        urls = self.pages[1:] + [
+            reverse('posts:group_feed', kwargs={'slug': 'group'}),
+            reverse('posts:profile_feed', kwargs={'username': 'author'}),
+        ]
+        for url in urls:
+            Client().get(url)
+        extra.delete()
+        for url in urls:
+            with self.subTest(url=url):
+                response = Client().get(url, HTTP_IF_MODIFIED_SINCE=since)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn('Last-Modified', response)
+                self.assertNotContains(response, 'Удалят')
+
+    def test_changes_and_user_change_etag(self):
+        """Комментарий, пост, подписка и другой пользователь меняют ETag."""
+        responses = [Client().get(url) for url in self.pages]
+        Comment.objects.create(post=self.post, author=self.reader, text='!')
+        Post.objects.create(author=self.author, group=self.group, text='Ещё')
+        for url, response in zip(self.pages, responses):
+            with self.subTest(url=url):
+                self.assertEqual(self.revalidate(url, response).status_code,
+                                 200)
+        profile = self.pages[1]
+        response = Client().get(profile)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.revalidate(profile, response).status_code, 200)
+        response = Client().get(profile)
+        client = Client()
+        client.force_login(self.reader)
+        self.assertEqual(
+            self.revalidate(profile, response, client).status_code, 200
+        )
+
+    def test_missing_page_is_404(self):
+        """Без записи валидаторов нет, отвечает сама view."""
+        response = Client().get(
+            reverse('posts:group_list', kwargs={'slug': 'missing'}),
+            HTTP_IF_NONE_MATCH='*',
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,81 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+
+
+User = get_user_model()
+
+
+class FeedTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='blogger')
+        cls.group = Group.objects.create(
+            title='Путешествия', slug='travel', description='Дороги'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Доехали до моря'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.feeds = [
+            reverse('posts:group_feed', kwargs={'slug': 'travel'}),
+            reverse('posts:group_atom_feed', kwargs={'slug': 'travel'}),
+            reverse('posts:profile_feed', kwargs={'username': 'blogger'}),
+            reverse(
+                'posts:profile_atom_feed', kwargs={'username': 'blogger'}
+            ),
+        ]
+
+    def test_feeds_list_posts(self):
+        """Ленты отдают XML с постами группы и автора."""
+        link = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        for url in self.feeds:
+            with self.subTest(url=url):
+                response = Client().get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('xml', response['Content-Type'])
+                self.assertContains(response, 'Доехали до моря')
+                self.assertContains(response, link)
+        self.assertContains(Client().get(self.feeds[1]), '<feed')
+
+    def test_xml_cached_until_new_post(self):
+        """XML строится один раз и заново — только после нового поста."""
+        url = self.feeds[0]
+        Client().get(url)
+        with self.assertNumQueries(1):
+            Client().get(url)
+        Post.objects.create(
+            author=self.author, group=self.group, text='Вернулись домой'
+        )
+        self.assertContains(Client().get(url), 'Вернулись домой')
+
+    def test_poll_gets_not_modified(self):
+        """Повторный опрос с ETag получает 304."""
+        for url in self.feeds:
+            with self.subTest(url=url):
+                response = Client().get(url)
+                again = Client().get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(again.status_code, 304)
+
+    def test_unknown_group(self):
+        """Лента несуществующей группы — 404."""
+        response = Client().get(
+            reverse('posts:group_feed', kwargs={'slug': 'nowhere'})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_pages_link_feeds(self):
+        """Страницы группы и автора ссылаются на свои ленты."""
+        response = Client().get(
+            reverse('posts:group_list', kwargs={'slug': 'travel'})
+        )
+        self.assertContains(response, self.feeds[0])
+        response = Client().get(
+            reverse('posts:profile', kwargs={'username': 'blogger'})
+        )
+        self.assertContains(response, self.feeds[3])
@@ -1,10 +1,15 @@
 import shutil
 import tempfile
+from io import BytesIO
+from unittest import mock
+
+from PIL import Image
 
 from django.test import Client, TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import cache
 from .. forms import PostForm, CommentForm
 from .. models import Post, Group, Comment
 from django.urls import reverse
@@ -85,13 +90,14 @@ class PostFormTest(TestCase):
         # Проверяем, увеличилось ли число постов
         self.assertEqual(Post.objects.count(), posts_count + 1)
         # Проверяем, что создался пост с данными из формы
-        self.assertTrue(
-            Post.objects.filter(
-                author=PostFormTest.user,
-                text='Тестовый текст',
-                group=PostFormTest.group,
-                image='posts/some.gif'
-            ).exists()
+        post = Post.objects.get(
+            author=PostFormTest.user,
+            text='Тестовый текст',
+            group=PostFormTest.group,
+        )
+        # Файл хранится под хешем содержимого (posts/storage.py)
+        self.assertRegex(
+            post.image.name, r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.'
         )
 
     def test_post_edit(self):
@@ -114,6 +120,25 @@ class PostFormTest(TestCase):
         # Проверяем, обновился ли пост
         self.assertEqual(post.text, 'Текст обновлённого поста')
 
+    def test_post_edit_keeps_concurrent_comments(self):
+        """Правка поста не затирает счётчик комментариев."""
+        post = PostFormTest.post
+        is_valid = PostForm.is_valid
+
+        def comment_meanwhile(form):
+            # Комментарий появляется, пока правка уже прочитала пост
+            Comment.objects.create(post=post, author=self.user, text='!')
+            return is_valid(form)
+
+        with mock.patch.object(PostForm, 'is_valid', comment_meanwhile):
+            self.author_client.post(
+                reverse('posts:post_edit', kwargs={'post_id': post.id}),
+                data={'text': 'Поправленный текст'},
+            )
+        post = Post.objects.get(id=post.id)
+        self.assertEqual(post.text, 'Поправленный текст')
+        self.assertEqual(post.comments_count, 1)
+
     def test_labels(self):
         """labels в полях совпадает с ожидаемым."""
         form = PostFormTest.form
@@ -141,6 +166,90 @@ class PostFormTest(TestCase):
                     form.fields[field].help_text, expected_value)
 
 
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_IMAGE_MAX_SIDE=100)
+class ImageIngestTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='photoAuthor')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(ImageIngestTest.user)
+
+    def upload(self, name, image, **params):
+        buffer = BytesIO()
+        image.save(buffer, **params)
+        self.author_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': name,
+                'image': SimpleUploadedFile(name, buffer.getvalue()),
+            },
+        )
+        post = Post.objects.get(text=name)
+        return Image.open(post.image.path)
+
+    def test_photo_is_downscaled_rotated_and_stripped(self):
+        """Фото уменьшается, поворачивается по EXIF и теряет EXIF."""
+        exif = Image.Exif()
+        # Ориентация 6: снимок нужно повернуть на 90° по часовой стрелке
+        exif[0x0112] = 6
+        stored = self.upload(
+            'photo.jpg', Image.new('RGB', (400, 200), 'green'),
+            format='JPEG', exif=exif.tobytes(),
+        )
+        self.assertEqual(stored.format, 'JPEG')
+        self.assertEqual(stored.size, (50, 100))
+        self.assertNotIn('exif', stored.info)
+
+    def test_transparent_image_stays_png(self):
+        """Картинка с прозрачностью пережимается в PNG."""
+        stored = self.upload(
+            'logo.png', Image.new('RGBA', (300, 150), (255, 0, 0, 128)),
+            format='PNG',
+        )
+        self.assertEqual(stored.format, 'PNG')
+        self.assertEqual(stored.size, (100, 50))
+        self.assertEqual(stored.mode, 'RGBA')
+
+    def test_truncated_image_is_rejected(self):
+        """Обрезанный JPEG — ошибка формы, а не 500."""
+        buffer = BytesIO()
+        Image.effect_noise((200, 200), 64).convert('RGB').save(
+            buffer, format='JPEG'
+        )
+        truncated = buffer.getvalue()[:len(buffer.getvalue()) // 2]
+        response = self.author_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'truncated.jpg',
+                'image': SimpleUploadedFile('truncated.jpg', truncated),
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(
+            response, 'form', 'image',
+            PostForm.base_fields['image'].error_messages['invalid_image'],
+        )
+        self.assertFalse(Post.objects.filter(text='truncated.jpg').exists())
+
+    def test_dimensions_and_placeholder_are_stored(self):
+        """Размеры и средний цвет картинки сохраняются в посте."""
+        self.upload('red.jpg', Image.new('RGB', (300, 150), 'red'),
+                    format='JPEG')
+        post = Post.objects.get(text='red.jpg')
+        self.assertEqual((post.image_width, post.image_height), (100, 50))
+        red, green, blue = bytes.fromhex(post.image_placeholder[1:])
+        self.assertGreater(red, 240)
+        self.assertLess(max(green, blue), 16)
+
+
 class CommentFormTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -178,7 +287,9 @@ class CommentFormTest(TestCase):
         comment = Comment.objects.first()
         # Проверяем, появился ли комментарий
         self.assertEqual(comment.text, 'Текст комментария')
-        # Проверяем, появился ли комментарий в контексте шаблона post_detail
+        # Проверяем, появился ли комментарий в контексте шаблона post_detail;
+        # после редиректа страница уже закэширована, поэтому чистим кэш
+        cache.clear()
         response = self.authorized_client.get(
             reverse('posts:post_detail', kwargs={'post_id': post.id})
         )
@@ -0,0 +1,192 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+
+from .. import typeahead
+from ..management.commands import import_posts
+from ..models import (
+    Comment, Follow, Group, Post, TimelineEntry, UserStats
+)
+from ..search import SearchPaginator
+from ..stats import get_stats
+
+
+User = get_user_model()
+
+
+@override_settings(TYPEAHEAD_CHECK_EVERY=0)
+class ImportPostsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.writer = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(
+            title='Старое', slug='archive', description='Архив'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def write(self, suffix, content):
+        file = tempfile.NamedTemporaryFile(
+            'w', suffix=suffix, encoding='utf-8', delete=False
+        )
+        with file:
+            file.write(content)
+        self.addCleanup(os.remove, file.name)
+        return file.name
+
+    def run_import(self, path, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_posts', path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_jsonl_import(self):
+        """Посты, комментарии и подписки загружаются с датами и счётчиками."""
+        records = [
+            {'type': 'follow', 'user': 'reader', 'author': 'writer'},
+            {'type': 'follow', 'user': 'reader', 'author': 'writer'},
+            {'type': 'post', 'id': 500, 'author': 'writer',
+             'group': 'archive', 'text': 'Старая заметка',
+             'created': '2015-03-01T10:00:00'},
+            {'type': 'post', 'id': 501, 'author': 'newcomer',
+             'group': 'fresh', 'text': 'Первая запись'},
+            {'type': 'comment', 'post': 500, 'author': 'reader',
+             'text': 'Помню', 'created': '2015-03-02T10:00:00'},
+            {'type': 'comment', 'post': 999, 'author': 'reader',
+             'text': 'Мимо'},
+            {'type': 'post', 'author': 'writer'},
+        ]
+        lines = [json.dumps(record) for record in records] + ['{oops']
+        typeahead.users.search('n')
+        out, err = self.run_import(self.write('.jsonl', '\n'.join(lines)))
+        self.assertIn('Постов: 2, комментариев: 1, подписок: 1,', out)
+        self.assertIn('с ошибкой: 3', out)
+        self.assertIn('Строка 6: нет поста 999', err)
+        self.assertIn('Строка 7: нет поля text', err)
+        self.assertIn('Строка 8:', err)
+
+        post = Post.objects.get(id=500)
+        self.assertEqual(post.created.year, 2015)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(Comment.objects.get().created.day, 2)
+        self.assertEqual(Follow.objects.count(), 1)
+        self.assertEqual(Group.objects.get(slug='fresh').posts.count(), 1)
+        stats = get_stats(User.objects.get(username='writer'))
+        self.assertEqual((stats.posts_count, stats.followers_count), (1, 1))
+        # То, что обычно делают сигналы: поиск, ленты, подсказки
+        page = SearchPaginator('заметка', 10).get_page()
+        self.assertEqual([found.id for found in page], [500])
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.reader, post_id=500
+        ).exists())
+        self.assertEqual(
+            [found.value for found in typeahead.users.search('n')],
+            ['newcomer'],
+        )
+        # Новому пользователю импорт сам заводит и считает счётчики
+        self.assertEqual(
+            UserStats.objects.get(user__username='newcomer').posts_count, 1
+        )
+        # Счётчик id не выдаёт занятые импортом значения
+        new_post = Post.objects.create(author=self.writer, text='Новый')
+        self.assertNotIn(new_post.id, (500, 501))
+
+    def test_taken_ids_and_bad_names_are_skipped(self):
+        """Занятый id и негодные слаг или имя — ошибки строк, не остановка."""
+        Post.objects.create(id=700, author=self.writer, text='Уже есть')
+        records = [
+            {'type': 'post', 'id': 700, 'author': 'writer', 'text': 'Дубль'},
+            {'type': 'post', 'id': 701, 'author': 'writer', 'text': 'Новый'},
+            {'type': 'post', 'id': 701, 'author': 'writer', 'text': 'Снова'},
+            {'type': 'post', 'author': 'writer', 'group': 'with space',
+             'text': 'Плохая группа'},
+            {'type': 'post', 'author': 'bad name', 'text': 'Плохой автор'},
+            {'type': 'follow', 'user': 'reader', 'author': 'no/slash'},
+        ]
+        out, err = self.run_import(self.write(
+            '.jsonl', '\n'.join(json.dumps(record) for record in records)
+        ))
+        self.assertIn('Постов: 1,', out)
+        self.assertIn('с ошибкой: 5', out)
+        self.assertIn('Строка 1: id 700 уже занят', err)
+        self.assertIn('Строка 3: id 701 уже занят', err)
+        self.assertIn(
+            "Строка 4: group: недопустимое значение 'with space'", err
+        )
+        self.assertIn('Строка 5: author: недопустимое значение', err)
+        self.assertIn('Строка 6: author: недопустимое значение', err)
+        self.assertEqual(Post.objects.get(id=700).text, 'Уже есть')
+        self.assertEqual(Post.objects.get(id=701).text, 'Новый')
+        self.assertFalse(Group.objects.filter(slug='with space').exists())
+        self.assertEqual(self.client.get('/').status_code, 200)
+
+    def test_failed_chunk_keeps_earlier_ones_searchable(self):
+        """После ошибки в порции сохранённые посты всё равно в поиске."""
+        records = [
+            {'type': 'post', 'id': 800, 'author': 'writer',
+             'text': 'Дошедшая заметка'},
+            {'type': 'follow', 'user': 'reader', 'author': 'writer'},
+        ]
+        path = self.write(
+            '.jsonl', '\n'.join(json.dumps(record) for record in records)
+        )
+        bulk_create = Follow.objects.bulk_create
+
+        def fail_on_follows(objs, **kwargs):
+            if objs:
+                raise IntegrityError('конфликт')
+            return bulk_create(objs, **kwargs)
+
+        patch_follows = mock.patch.object(
+            Follow.objects, 'bulk_create', fail_on_follows
+        )
+        with mock.patch.object(import_posts, 'CHUNK_SIZE', 1), patch_follows:
+            with self.assertRaisesMessage(CommandError, 'Строки 2–2'):
+                self.run_import(path)
+        page = SearchPaginator('заметка', 10).get_page()
+        self.assertEqual([found.id for found in page], [800])
+
+    @override_settings(FEED_MODE='hybrid', FEED_FANOUT_THRESHOLD=2)
+    def test_imported_follows_mark_popular_authors(self):
+        """Автор, набравший порог на импорте, уходит из раздачи по лентам."""
+        records = [
+            {'type': 'follow', 'user': 'reader', 'author': 'writer'},
+            {'type': 'follow', 'user': 'fan', 'author': 'writer'},
+            {'type': 'follow', 'user': 'writer', 'author': 'reader'},
+            {'type': 'post', 'id': 900, 'author': 'writer',
+             'text': 'Популярная запись'},
+        ]
+        self.run_import(self.write(
+            '.jsonl', '\n'.join(json.dumps(record) for record in records)
+        ))
+        pulled = dict(UserStats.objects.values_list('user_id', 'feed_pulled'))
+        self.assertTrue(pulled[self.writer.id])
+        self.assertFalse(pulled[self.reader.id])
+        self.assertFalse(
+            TimelineEntry.objects.filter(post_id=900).exists()
+        )
+
+    def test_csv_with_type_option(self):
+        """CSV одного типа загружается с --type."""
+        path = self.write(
+            '.csv',
+            'author,group,text\n'
+            'writer,archive,"Текст, с запятой"\n'
+            'writer,,Без группы\n',
+        )
+        out, err = self.run_import(path, '--type', 'post')
+        self.assertEqual(err, '')
+        self.assertEqual(
+            set(Post.objects.values_list('text', flat=True)),
+            {'Текст, с запятой', 'Без группы'},
+        )
+        self.assertEqual(self.group.posts.count(), 1)
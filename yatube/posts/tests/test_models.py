@@ -1,7 +1,12 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from ..models import Group, Post, Comment, CHAR_Q
+from ..models import Group, Post, Comment, Follow, UserStats, CHAR_Q
 
 User = get_user_model()
 
@@ -96,3 +101,90 @@ class PostModelTest(TestCase):
         text_help_text = comment._meta.get_field('text').help_text
         expected = 'Введите текст комментария'
         self.assertEqual(text_help_text, expected)
+
+
+class CommentsCountTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='commentator')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+
+    def add_comment(self):
+        return Comment.objects.create(
+            post=self.post, author=self.user, text='Комментарий'
+        )
+
+    def test_counter_follows_comments(self):
+        """comments_count растёт и уменьшается вместе с комментариями."""
+        first = self.add_comment()
+        self.add_comment()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 2)
+        first.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_post_delete_skips_cascaded_comments(self):
+        """Удаление поста не обновляет его счётчик за каждый комментарий."""
+        def delete_queries(comments):
+            post = Post.objects.create(author=self.user, text='Пост')
+            Comment.objects.bulk_create(
+                Comment(post=post, author=self.user, text='!')
+                for _ in range(comments)
+            )
+            with CaptureQueriesContext(connection) as context:
+                post.delete()
+            return len(context.captured_queries)
+
+        self.assertEqual(delete_queries(20), delete_queries(1))
+        # Комментарии к живым постам по-прежнему уменьшают счётчик
+        comment = self.add_comment()
+        comment.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+
+    def test_repair_command_fixes_drift(self):
+        """Команда repair_comment_counts исправляет расхождение."""
+        self.add_comment()
+        Post.objects.filter(pk=self.post.pk).update(comments_count=5)
+        call_command('repair_comment_counts', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+
+
+class UserStatsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='statsAuthor')
+        cls.reader = User.objects.create_user(username='statsReader')
+
+    def test_counters_follow_posts_and_follows(self):
+        """Счётчики UserStats меняются вместе с постами и подписками."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.author.stats.refresh_from_db()
+        self.reader.stats.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, 1)
+        self.assertEqual(self.author.stats.followers_count, 1)
+        self.assertEqual(self.reader.stats.following_count, 1)
+        post.delete()
+        follow.delete()
+        self.author.stats.refresh_from_db()
+        self.reader.stats.refresh_from_db()
+        self.assertEqual(self.author.stats.posts_count, 0)
+        self.assertEqual(self.author.stats.followers_count, 0)
+        self.assertEqual(self.reader.stats.following_count, 0)
+
+    def test_reconcile_command_fixes_drift(self):
+        """Команда reconcile_user_stats исправляет счётчики.
+
+        Недостающие строки счётчиков она создаёт заново.
+        """
+        Post.objects.create(author=self.author, text='Пост')
+        UserStats.objects.filter(user=self.author).update(posts_count=7)
+        UserStats.objects.filter(user=self.reader).delete()
+        call_command('reconcile_user_stats', stdout=StringIO())
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 1
+        )
+        self.assertTrue(UserStats.objects.filter(user=self.reader).exists())
@@ -0,0 +1,112 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Post
+from ..paginator import (
+    CachedCountPaginator, CursorPaginator, decode_cursor, encode_cursor
+)
+
+
+User = get_user_model()
+
+PER_PAGE = 4
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cursorAuthor')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Текст {i}') for i in range(10)
+        )
+        # Часть постов получает одинаковое время создания,
+        # чтобы проверить разрешение ничьих по id
+        same_time = timezone.now()
+        Post.objects.filter(
+            id__in=Post.objects.values('id')[:3]
+        ).update(created=same_time)
+        cls.post_list = list(Post.objects.order_by('-created', '-id'))
+
+    def get_page(self, **cursor):
+        paginator = CursorPaginator(Post.objects.all(), PER_PAGE)
+        return paginator.get_page(**cursor)
+
+    def test_cursor_round_trip(self):
+        """Токен курсора без потерь хранит время с микросекундами и id."""
+        created = datetime.datetime(
+            2022, 2, 20, 18, 17, 1, 123456, tzinfo=timezone.utc
+        )
+        self.assertEqual(
+            decode_cursor(encode_cursor(created, 42)), (created, 42)
+        )
+        self.assertIsNone(decode_cursor('испорченный'))
+        self.assertIsNone(decode_cursor(f'1_{2 ** 63}'))
+
+    def test_walk_forward_and_back(self):
+        """Переходы по next/previous курсорам обходят ленту без пропусков."""
+        pages = [self.get_page()]
+        while pages[-1].has_next():
+            pages.append(self.get_page(before=pages[-1].next_cursor))
+        walked = [post for page in pages for post in page]
+        self.assertEqual(walked, self.post_list)
+        self.assertFalse(pages[0].has_previous())
+        self.assertTrue(pages[-1].has_previous())
+        previous = self.get_page(after=pages[2].previous_cursor)
+        self.assertEqual(previous.object_list, pages[1].object_list)
+        self.assertTrue(previous.has_previous())
+        first = self.get_page(after=pages[1].previous_cursor)
+        self.assertEqual(first.object_list, pages[0].object_list)
+        self.assertFalse(first.has_previous())
+
+    def test_broken_cursor_shows_first_page(self):
+        """Испорченный курсор показывает первую страницу."""
+        page = self.get_page(before='abc')
+        self.assertEqual(page.object_list, self.post_list[:PER_PAGE])
+        page = self.get_page(before='1_99999999999999999999')
+        self.assertEqual(page.object_list, self.post_list[:PER_PAGE])
+
+
+class CachedCountPaginatorTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='countAuthor')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Текст {i}') for i in range(30)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_count_is_cached(self):
+        """Повторный подсчёт записей берётся из кэша без COUNT(*)."""
+        self.assertEqual(CachedCountPaginator(Post.objects.all(), 2).count, 30)
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                CachedCountPaginator(Post.objects.all(), 2).count, 30
+            )
+
+    def test_page_window(self):
+        """Шаблону отдаётся окно номеров, а не все страницы."""
+        paginator = CachedCountPaginator(Post.objects.all(), 2)
+        ellipsis = CachedCountPaginator.ELLIPSIS
+        self.assertEqual(
+            paginator.get_page(8).page_window,
+            [1, ellipsis, 6, 7, 8, 9, 10, ellipsis, 15]
+        )
+        self.assertEqual(
+            paginator.get_page(1).page_window, [1, 2, 3, ellipsis, 15]
+        )
+
+    def test_legacy_page_links_still_work(self):
+        """Старые ссылки ?page=N открывают нужную страницу ленты."""
+        response = self.client.get(reverse('posts:index') + '?page=2')
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.number, 2)
+        self.assertEqual(
+            page_obj.object_list, list(Post.objects.all()[10:20])
+        )
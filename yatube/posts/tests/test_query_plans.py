@@ -0,0 +1,96 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+from ..paginator import encode_cursor
+from ..views import POSTS_QUANTITY
+
+
+User = get_user_model()
+
+# Полный проход по таблице без индекса: «SCAN posts_post»
+# (в старых версиях SQLite — «SCAN TABLE posts_post»)
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\w+$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN есть в SQLite')
+class QueryPlanTest(TestCase):
+    """Запросы лент идут по индексам, без полного прохода и сортировки."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='planAuthor')
+        cls.reader = User.objects.create_user(username='planReader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='plan-group', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for i in range(POSTS_QUANTITY + 2):
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {i}'
+            )
+        cls.post = Post.objects.first()
+        cls.comment = Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_indexed(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        next_cursor = getattr(
+            response.context.get('page_obj'), 'next_cursor', ''
+        )
+        for query in context.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT'):
+                continue
+            for step in self.explain(sql):
+                with self.subTest(url=url, sql=sql, step=step):
+                    self.assertNotIn(TEMP_SORT, step)
+                    self.assertIsNone(FULL_SCAN.match(step))
+        return next_cursor
+
+    def test_feed_queries_use_indexes(self):
+        """Первая и следующая страницы лент читаются по индексам."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'planAuthor'}),
+            reverse('posts:follow_index'),
+        )
+        for url in urls:
+            next_cursor = self.assert_indexed(url)
+            self.assertTrue(next_cursor)
+            self.assert_indexed(f'{url}?before={next_cursor}')
+
+    def test_post_detail_queries_use_indexes(self):
+        """Страница поста и подгрузка комментариев читаются по индексам."""
+        detail = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        more = reverse('posts:post_comments', kwargs={'post_id': self.post.id})
+        cursor = encode_cursor(self.comment.created, self.comment.id)
+        for url in (
+            detail,
+            f'{detail}?order=newest',
+            f'{more}?after={cursor}',
+            f'{more}?order=newest&after={cursor}',
+        ):
+            self.assert_indexed(url)
@@ -0,0 +1,125 @@
+from io import StringIO
+
+from django.contrib.admin.sites import AdminSite
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, RequestFactory, TestCase
+from django.urls import reverse
+
+from ..admin import PostAdmin
+from ..models import Group, Post
+from ..search import SearchPaginator
+
+
+User = get_user_model()
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='felinologist')
+        cls.other = User.objects.create_user(username='cynologist')
+        cls.cats = Group.objects.create(
+            title='Кошки', slug='cats', description='Про кошек'
+        )
+        cls.dogs = Group.objects.create(
+            title='Собаки', slug='dogs', description='Про собак'
+        )
+        cls.sleeping = Post.objects.create(
+            author=cls.author, group=cls.cats, text='Кот спит на диване'
+        )
+        cls.playing = Post.objects.create(
+            author=cls.author, group=cls.cats, text='Коты играют с ёлкой'
+        )
+        cls.walking = Post.objects.create(
+            author=cls.other, group=cls.dogs, text='Собака гуляет с котом'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def found(self, query, **filters):
+        page = SearchPaginator(query, 10, **filters).get_page()
+        return set(post.text for post in page)
+
+    def test_word_forms_and_yo(self):
+        """Поиск находит другие формы слова и не различает «е» и «ё»."""
+        self.assertEqual(
+            self.found('котами'),
+            {self.sleeping.text, self.playing.text, self.walking.text},
+        )
+        self.assertEqual(self.found('елка'), {self.playing.text})
+        self.assertEqual(self.found('AND "'), set())
+
+    def test_index_follows_edits_and_deletes(self):
+        """Правка и удаление поста сразу видны в поиске."""
+        post = Post.objects.get(id=self.sleeping.id)
+        post.text = 'Кот проснулся'
+        post.save()
+        self.assertEqual(self.found('диван'), set())
+        self.assertEqual(self.found('проснулся'), {'Кот проснулся'})
+        Post.objects.filter(id=self.playing.id).delete()
+        self.assertEqual(self.found('играют'), set())
+
+    def test_facets_and_filters(self):
+        """Фасеты считают найденное, фильтр сужает выдачу."""
+        paginator = SearchPaginator('кот', 10, group_id=self.cats.id)
+        self.assertEqual(
+            [(facet.label, facet.count) for facet in paginator.group_facets()],
+            [('Кошки', 2), ('Собаки', 1)],
+        )
+        self.assertEqual(
+            [facet.count for facet in paginator.author_facets()], [2]
+        )
+        self.assertEqual(len(paginator.get_page()), 2)
+
+    def test_keyset_pages_cover_all_results(self):
+        """Курсор ?after= проходит все результаты без повторов."""
+        paginator = SearchPaginator('кот', 2)
+        page = paginator.get_page()
+        seen = [post.id for post in page]
+        self.assertTrue(page.has_next())
+        page = SearchPaginator('кот', 2).get_page(page.next_cursor)
+        seen.extend(post.id for post in page)
+        self.assertFalse(page.has_next())
+        self.assertEqual(len(seen), 3)
+        self.assertEqual(len(set(seen)), 3)
+
+    def test_search_page(self):
+        """Страница поиска показывает найденные посты и фасеты."""
+        response = Client().get(
+            reverse('posts:search'), {'q': 'собака', 'group': self.dogs.id}
+        )
+        self.assertEqual(list(response.context['page_obj']), [self.walking])
+        self.assertContains(response, 'Собаки · 1')
+
+    def test_out_of_range_numbers_are_ignored(self):
+        """Слишком большие id в фильтре и курсоре не роняют поиск."""
+        huge = '9' * 20
+        for params in ({'group': huge}, {'after': f'1.0_{huge}'}):
+            with self.subTest(params=params):
+                response = Client().get(
+                    reverse('posts:search'), {'q': 'собака', **params}
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    list(response.context['page_obj']), [self.walking]
+                )
+
+    def test_admin_uses_index(self):
+        """Поиск в админке идёт через индекс."""
+        admin = PostAdmin(Post, AdminSite())
+        request = RequestFactory().get('/admin/posts/post/', {'q': 'спит'})
+        queryset, use_distinct = admin.get_search_results(
+            request, Post.objects.all(), 'спит'
+        )
+        self.assertEqual(list(queryset), [self.sleeping])
+        self.assertFalse(use_distinct)
+
+    def test_rebuild_command(self):
+        """rebuild_search_index подхватывает правки в обход сигналов."""
+        Post.objects.filter(id=self.walking.id).update(text='Пёс дремлет')
+        self.assertEqual(self.found('дремлет'), set())
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.found('дремлет'), {'Пёс дремлет'})
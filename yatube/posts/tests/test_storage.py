@@ -0,0 +1,179 @@
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from .. import thumbnails
+from ..management.commands import gc_media
+from ..models import Post
+from ..storage import ContentAddressedStorage, is_hashed
+
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.storage = ContentAddressedStorage()
+
+    def count_files(self):
+        return sum(
+            len(files)
+            for _, _, files in os.walk(os.path.join(TEMP_MEDIA_ROOT, 'posts'))
+        )
+
+    def test_identical_files_are_stored_once(self):
+        """Одинаковое содержимое сохраняется один раз под хешем."""
+        first = self.storage.save('posts/a.GIF', ContentFile(SMALL_GIF))
+        second = self.storage.save('posts/b.gif', ContentFile(SMALL_GIF))
+        self.assertEqual(first, second)
+        self.assertTrue(is_hashed(first))
+        self.assertTrue(first.endswith('.gif'))
+        self.assertEqual(self.count_files(), 1)
+
+    def test_duplicate_save_refreshes_mtime(self):
+        """Повторное сохранение того же содержимого обновляет mtime файла."""
+        name = self.storage.save('posts/a.gif', ContentFile(SMALL_GIF))
+        path = self.storage.path(name)
+        old = time.time() - 2 * 24 * 60 * 60
+        os.utime(path, (old, old))
+        self.storage.save('posts/b.gif', ContentFile(SMALL_GIF))
+        self.assertGreater(os.stat(path).st_mtime, old + 60)
+
+    def test_rehome_moves_flat_files(self):
+        """rehome_images переносит старые файлы и удаляет их."""
+        old_name = 'posts/old.gif'
+        path = os.path.join(TEMP_MEDIA_ROOT, old_name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(SMALL_GIF)
+        user = User.objects.create_user(username='mover')
+        posts = [
+            Post.objects.create(author=user, text=str(i), image=old_name)
+            for i in range(2)
+        ]
+        out = StringIO()
+        call_command('rehome_images', stdout=out)
+        self.assertIn('Перенесено: 1, общих с другими постами: 1',
+                      out.getvalue())
+        names = set()
+        for post in posts:
+            post.refresh_from_db()
+            names.add(post.image.name)
+        self.assertEqual(len(names), 1)
+        new_name = names.pop()
+        self.assertTrue(is_hashed(new_name))
+        self.assertTrue(self.storage.exists(new_name))
+        self.assertFalse(self.storage.exists(old_name))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaGarbageCollectorTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='keeper')
+        self.post = Post.objects.create(
+            author=user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('kept.gif', SMALL_GIF, 'image/gif'),
+        )
+        self.assertTrue(thumbnails.generate(self.post.image.name))
+        self.kept = [
+            path for path in self.files() if 'orphan' not in path
+        ]
+        self.orphans = [
+            self.write('posts/orphan.gif', age=2 * 24 * 60 * 60),
+            self.write('cache/ab/cd/orphan.jpg', age=2 * 24 * 60 * 60),
+        ]
+        self.fresh = self.write('posts/orphan-fresh.gif', age=0)
+
+    def tearDown(self):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def write(self, name, age):
+        path = os.path.join(TEMP_MEDIA_ROOT, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(SMALL_GIF)
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def files(self):
+        return {
+            os.path.join(directory, name)
+            for directory, _, names in os.walk(TEMP_MEDIA_ROOT)
+            for name in names
+        }
+
+    def gc(self, *args):
+        out = StringIO()
+        call_command('gc_media', *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_only_reports(self):
+        """--dry-run считает осиротевшие файлы, ничего не удаляя."""
+        self.assertIn('Можно удалить: 2 файлов', self.gc('--dry-run'))
+        self.assertEqual(len(self.files()), len(self.kept) + 3)
+
+    def test_orphans_are_removed(self):
+        """Удаляются только старые файлы без ссылок из постов."""
+        self.assertIn('пропущено свежих: 1', self.gc())
+        self.assertEqual(self.files(), set(self.kept) | {self.fresh})
+
+    def test_file_reused_during_gc_is_kept(self):
+        """Картинку, доставшуюся посту после сбора ссылок, не удаляют."""
+        referenced = gc_media.referenced_names()
+        Post.objects.create(
+            author=self.post.author, text='Та же картинка',
+            image='posts/orphan.gif',
+        )
+        with mock.patch.object(
+            gc_media, 'referenced_names', return_value=referenced
+        ):
+            self.assertIn('снова используются: 1', self.gc())
+        self.assertTrue(os.path.exists(self.orphans[0]))
+        self.assertFalse(os.path.exists(self.orphans[1]))
+
+    def test_quarantine_keeps_files_aside(self):
+        """С --quarantine файлы переносятся, а не удаляются."""
+        quarantine = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, quarantine, ignore_errors=True)
+        self.gc('--quarantine', quarantine)
+        self.assertTrue(os.path.exists(
+            os.path.join(quarantine, 'posts', 'orphan.gif')
+        ))
+        self.assertFalse(os.path.exists(self.orphans[0]))
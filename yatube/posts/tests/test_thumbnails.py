@@ -0,0 +1,303 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from .. import thumbnails
+from ..models import Post
+
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def png(color):
+    buffer = BytesIO()
+    Image.new('RGB', (2, 1), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='photographer')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                name='thumb.gif', content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.id}
+        )
+
+    def test_page_shows_placeholder_until_thumbnail_is_ready(self):
+        """Пока миниатюры нет, страница отдаёт заглушку, не создавая её."""
+        response = self.client.get(self.url)
+        self.assertContains(response, 'data:image/svg+xml')
+        self.assertContains(response, 'width="960" height="339"')
+
+    def test_generated_thumbnail_is_used(self):
+        """После генерации страница показывает готовую миниатюру."""
+        self.client.get(self.url)
+        self.assertTrue(thumbnails.generate(self.post.image.name))
+        response = self.client.get(self.url)
+        self.assertNotContains(response, 'data:image/svg+xml')
+        self.assertContains(response, settings.MEDIA_URL + 'cache/')
+
+    @override_settings(POST_THUMBNAIL_WIDTHS=(480, 960))
+    def test_srcset_lists_every_width(self):
+        """Готовые миниатюры всех ширин попадают в srcset."""
+        self.assertTrue(thumbnails.generate(self.post.image.name))
+        response = self.client.get(self.url)
+        self.assertContains(response, ' 480w, ')
+        self.assertContains(response, ' 960w"')
+        self.assertContains(response, 'width="960" height="339"')
+        self.assertNotContains(response, 'loading="lazy"')
+
+    def test_prefetch_reads_page_in_one_query(self):
+        """prefetch читает миниатюры страницы разом, тег — уже без запросов."""
+        self.assertTrue(thumbnails.generate(self.post.image.name))
+        fresh = Post.objects.create(
+            author=self.user, text='Без миниатюры', image='posts/fresh.gif'
+        )
+        cache.clear()
+        self.addCleanup(thumbnails.forget_prefetched)
+        with self.assertNumQueries(1):
+            thumbnails.prefetch([self.post, fresh])
+        backend = thumbnails.PregeneratedThumbnailBackend()
+        geometry, options = thumbnails.geometries()[-1]
+        with self.assertNumQueries(0):
+            ready = backend.get_thumbnail(self.post.image, geometry, **options)
+            missing = backend.get_thumbnail(fresh.image, geometry, **options)
+        self.assertTrue(ready.url.startswith(settings.MEDIA_URL + 'cache/'))
+        self.assertIsInstance(missing, thumbnails.Placeholder)
+
+    def test_missing_source_is_skipped(self):
+        """Для отсутствующего файла миниатюры не создаются."""
+        self.assertFalse(thumbnails.generate('posts/missing.jpg'))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class RebuildThumbnailsCommandTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='archivist')
+        cls.posts = [
+            Post.objects.create(
+                author=user,
+                text=f'Пост {i}',
+                # Разные картинки: одинаковые хранилище бы объединило
+                image=SimpleUploadedFile(
+                    name=f'rebuild{i}.png',
+                    content=png(color=(i, 0, 0)),
+                    content_type='image/png'
+                ),
+            )
+            for i in range(3)
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(
+            os.path.join(TEMP_MEDIA_ROOT, 'cache'), ignore_errors=True
+        )
+        self.checkpoint = os.path.join(TEMP_MEDIA_ROOT, 'checkpoint')
+
+    def rebuild(self, *args, workers=0):
+        out = StringIO()
+        call_command(
+            'rebuild_thumbnails', '--workers', str(workers),
+            '--checkpoint-file', self.checkpoint, *args, stdout=out
+        )
+        return out.getvalue()
+
+    def thumbnail_paths(self, post):
+        source = thumbnails.source_file(post.image.name)
+        backend = thumbnails.PregeneratedThumbnailBackend()
+        return [
+            os.path.join(
+                TEMP_MEDIA_ROOT,
+                backend.thumbnail_file(source, geometry, options).name,
+            )
+            for geometry, options in thumbnails.geometries()
+        ]
+
+    def count_thumbnails(self):
+        return sum(
+            len(files)
+            for _, _, files in os.walk(os.path.join(TEMP_MEDIA_ROOT, 'cache'))
+        )
+
+    def test_rebuild_creates_thumbnails(self):
+        """Команда создаёт миниатюры всех изображений."""
+        self.assertIn('Готово: 3', self.rebuild())
+        self.assertEqual(
+            self.count_thumbnails(), 3 * len(thumbnails.geometries())
+        )
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_rebuild_in_process_pool(self):
+        """С процессами пула миниатюры тоже создаются и попадают в sorl."""
+        self.assertIn('Готово: 3', self.rebuild(workers=1))
+        self.assertEqual(
+            self.count_thumbnails(), 3 * len(thumbnails.geometries())
+        )
+        self.assertFalse(os.path.exists(self.checkpoint))
+        backend = thumbnails.PregeneratedThumbnailBackend()
+        for post in self.posts:
+            for geometry, options in thumbnails.geometries():
+                ready = backend.get_thumbnail(post.image, geometry, **options)
+                self.assertNotIsInstance(ready, thumbnails.Placeholder)
+
+    def test_rebuild_redraws_existing_thumbnails(self):
+        """Уже известные sorl миниатюры рисуются заново, а не пропускаются."""
+        thumbnails.generate(self.posts[0].image.name)
+        paths = self.thumbnail_paths(self.posts[0])
+        for path in paths:
+            with open(path, 'wb') as file:
+                file.write(b'broken')
+        self.assertIn('Готово: 3', self.rebuild())
+        for path in paths:
+            with Image.open(path) as image:
+                image.verify()
+        self.assertEqual(
+            self.count_thumbnails(), 3 * len(thumbnails.geometries())
+        )
+
+    def test_resume_skips_processed_posts(self):
+        """--resume продолжает после контрольной точки из файла."""
+        with open(self.checkpoint, 'w') as file:
+            file.write(str(self.posts[1].id))
+        self.assertIn('Готово: 1', self.rebuild('--resume'))
+        self.assertEqual(
+            self.count_thumbnails(), len(thumbnails.geometries())
+        )
+
+    def test_dry_run_only_estimates(self):
+        """--dry-run оценивает время, ничего не создавая."""
+        self.assertIn('Изображений к обработке: 3', self.rebuild('--dry-run'))
+        self.assertEqual(self.count_thumbnails(), 0)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BackfillImageMetaCommandTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user(username='restorer')
+        cls.post = Post.objects.create(
+            author=user,
+            text='Старый пост',
+            image=SimpleUploadedFile(
+                name='old.gif', content=SMALL_GIF, content_type='image/gif'
+            ),
+        )
+        cls.lost = Post.objects.create(
+            author=user, text='Без файла', image='posts/lost.gif'
+        )
+        # Посты, сохранённые до появления полей
+        Post.objects.update(
+            image_width=None, image_height=None, image_placeholder=''
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_backfill_fills_dimensions_and_placeholder(self):
+        """Команда заполняет размеры и заглушку по файлу изображения."""
+        out = StringIO()
+        call_command('backfill_image_meta', stdout=out)
+        self.assertIn('Готово: 1, без исходного файла: 1', out.getvalue())
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.image_width, self.post.image_height),
+                         (2, 1))
+        self.assertRegex(self.post.image_placeholder, r'^#[0-9a-f]{6}$')
+        self.lost.refresh_from_db()
+        self.assertIsNone(self.lost.image_width)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageMetaOnSaveTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='editor', email='editor@example.com', password='pass'
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def upload(self, color):
+        return SimpleUploadedFile(
+            name='meta.png', content=png(color), content_type='image/png'
+        )
+
+    def test_orm_save_fills_and_clears_meta(self):
+        """Сохранение через ORM заполняет размеры и сбрасывает их с файлом."""
+        post = Post.objects.create(
+            author=self.admin, text='ORM', image=self.upload((255, 0, 0))
+        )
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertEqual(post.image_placeholder, '#ff0000')
+        post = Post.objects.get(id=post.id)
+        post.image = self.upload((0, 0, 255))
+        post.save()
+        self.assertEqual(post.image_placeholder, '#0000ff')
+        post.image = None
+        post.save()
+        post.refresh_from_db()
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_placeholder, '')
+
+    def test_admin_upload_fills_meta(self):
+        """Изображение, загруженное в админке, тоже получает размеры."""
+        client = Client()
+        client.force_login(self.admin)
+        client.post(reverse('admin:posts_post_add'), {
+            'text': 'Из админки',
+            'author': self.admin.id,
+            'image': self.upload((0, 255, 0)),
+        })
+        post = Post.objects.get(text='Из админки')
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertEqual(post.image_placeholder, '#00ff00')
@@ -0,0 +1,124 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Post, TimelineEntry
+from ..views import POSTS_QUANTITY
+
+
+User = get_user_model()
+
+
+def timeline_posts(user):
+    return [
+        entry.post for entry in
+        user.timeline.select_related('post').order_by('-created', '-post_id')
+    ]
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='timelineAuthor')
+        cls.reader = User.objects.create_user(username='timelineReader')
+        cls.old_post = Post.objects.create(author=cls.author, text='Старый')
+
+    def test_follow_backfills_and_new_posts_fan_out(self):
+        """Подписка докладывает старые посты, новые попадают в ленту сразу."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(timeline_posts(self.reader), [self.old_post])
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(
+            timeline_posts(self.reader), [new_post, self.old_post]
+        )
+
+    def test_unfollow_removes_author_posts(self):
+        """После отписки посты автора пропадают из ленты."""
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        follow.delete()
+        self.assertFalse(self.reader.timeline.exists())
+
+    @override_settings(FEED_TIMELINE_DEPTH=2, FEED_TIMELINE_TRIM_EVERY=1)
+    def test_timeline_trimmed_to_depth(self):
+        """Лента обрезается до FEED_TIMELINE_DEPTH последних постов."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(3)
+        ]
+        self.assertEqual(timeline_posts(self.reader), posts[:0:-1])
+
+    def test_rebuild_command(self):
+        """Команда rebuild_timelines восстанавливает потерянную ленту."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(timeline_posts(self.reader), [self.old_post])
+
+
+@override_settings(FEED_MODE='hybrid', FEED_FANOUT_THRESHOLD=2)
+class HybridFeedTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.star = User.objects.create_user(username='starAuthor')
+        cls.author = User.objects.create_user(username='plainAuthor')
+        cls.reader = User.objects.create_user(username='hybridReader')
+        cls.fan = User.objects.create_user(username='starFan')
+
+    def setUp(self):
+        Follow.objects.create(user=self.fan, author=self.star)
+        Follow.objects.create(user=self.reader, author=self.star)
+        Follow.objects.create(user=self.reader, author=self.author)
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def test_heavy_author_is_pulled_not_pushed(self):
+        """Посты популярного автора не раскладываются по лентам."""
+        post = Post.objects.create(author=self.star, text='Для всех')
+        self.assertFalse(post.timeline_entries.exists())
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+
+    def test_merged_feed_is_ordered_and_pages(self):
+        """Слитая лента упорядочена и листается курсором без потерь."""
+        posts = [
+            Post.objects.create(author=author, text=f'Пост {i}')
+            for i, author in enumerate([self.star, self.author] * 7)
+        ]
+        expected = posts[::-1]
+        response = self.client.get(reverse('posts:follow_index'))
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.object_list, expected[:POSTS_QUANTITY])
+        response = self.client.get(
+            reverse('posts:follow_index') + f'?before={page_obj.next_cursor}'
+        )
+        self.assertEqual(
+            response.context['page_obj'].object_list,
+            expected[POSTS_QUANTITY:]
+        )
+
+    def test_former_heavy_author_posts_stay_in_feed(self):
+        """Посты автора, потерявшего подписчиков, не пропадают из ленты."""
+        post = Post.objects.create(author=self.star, text='Для всех')
+        Follow.objects.get(user=self.fan, author=self.star).delete()
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+        call_command('release_feed_authors', stdout=StringIO())
+        self.assertEqual(
+            list(post.timeline_entries.values_list('user', flat=True)),
+            [self.reader.id],
+        )
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+        new_post = Post.objects.create(author=self.star, text='Снова в ленту')
+        self.assertTrue(new_post.timeline_entries.exists())
+
+    @override_settings(FEED_MODE='push')
+    def test_push_mode_fans_out_everyone(self):
+        """В режиме push посты раскладываются по лентам всех подписчиков."""
+        post = Post.objects.create(author=self.star, text='Всем в ленту')
+        self.assertEqual(post.timeline_entries.count(), 2)
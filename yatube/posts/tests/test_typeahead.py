@@ -0,0 +1,127 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from .. import typeahead
+from ..models import Group
+
+
+User = get_user_model()
+
+
+# Проверка версии на каждом запросе: база между тестами откатывается
+@override_settings(TYPEAHEAD_CHECK_EVERY=0)
+class TypeaheadTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for username in ('anna', 'Andrey', 'boris', 'annette'):
+            User.objects.create_user(username=username)
+        Group.objects.create(
+            title='Кошки и собаки', slug='pets', description='Питомцы'
+        )
+        Group.objects.create(
+            title='Собачники', slug='dogs', description='Собаки'
+        )
+
+    def setUp(self):
+        # Индекс живёт в памяти процесса, а база откатывается после теста
+        cache.clear()
+
+    def values(self, index, prefix, limit=10):
+        return [
+            suggestion.value for suggestion in index.search(prefix, limit)
+        ]
+
+    def test_users_by_prefix(self):
+        """Пользователи ищутся по началу имени без учёта регистра."""
+        self.assertEqual(
+            self.values(typeahead.users, 'AN'), ['Andrey', 'anna', 'annette']
+        )
+        self.assertEqual(self.values(typeahead.users, 'an', limit=1),
+                         ['Andrey'])
+        self.assertEqual(self.values(typeahead.users, 'x'), [])
+        self.assertEqual(self.values(typeahead.users, 'a', limit=0), [])
+
+    def test_groups_by_slug_title_and_word(self):
+        """Группа находится по слагу, названию и слову из названия."""
+        self.assertEqual(self.values(typeahead.groups, 'pe'), ['pets'])
+        self.assertEqual(
+            self.values(typeahead.groups, 'соб'), ['pets', 'dogs']
+        )
+
+    def test_signals_update_loaded_index(self):
+        """Правки применяются к загруженному индексу без чтения базы."""
+        typeahead.users.search('a')
+        user = User.objects.get(username='boris')
+        user.username = 'alexander'
+        user.save()
+        User.objects.get(username='anna').delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.values(typeahead.users, 'a'),
+                ['alexander', 'Andrey', 'annette'],
+            )
+
+    def test_login_does_not_touch_index(self):
+        """Сохранение только last_login не пишет правку в журнал."""
+        typeahead.users.search('a')
+        seq = cache.get(typeahead.users.seq_key)
+        Client().force_login(User.objects.get(username='anna'))
+        self.assertEqual(cache.get(typeahead.users.seq_key), seq)
+
+    def test_other_process_change_applies_without_reload(self):
+        """Правка другого процесса доходит через журнал, без чтения базы."""
+        typeahead.groups.search('p')
+        other = typeahead.GroupIndex('groups')
+        other.update(typeahead.Suggestion(999, 'parrots', 'Попугаи'))
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                self.values(typeahead.groups, 'p'), ['parrots', 'pets']
+            )
+
+    def test_concurrent_changes_are_not_lost(self):
+        """Своя правка не скрывает чужую, сделанную раньше."""
+        first = typeahead.GroupIndex('groups')
+        second = typeahead.GroupIndex('groups')
+        first.search('p')
+        second.search('p')
+        second.update(typeahead.Suggestion(998, 'pigs', 'Свинки'))
+        first.update(typeahead.Suggestion(999, 'parrots', 'Попугаи'))
+        for index in (first, second):
+            with self.subTest(index=index):
+                self.assertEqual(
+                    self.values(index, 'p'), ['parrots', 'pets', 'pigs']
+                )
+
+    def test_lost_log_entry_reloads(self):
+        """Если правки нет в кэше, индекс перечитывается из базы."""
+        typeahead.groups.search('p')
+        typeahead.GroupIndex('groups').remove(999)
+        cache.delete(typeahead.groups.change_key(
+            cache.get(typeahead.groups.seq_key)
+        ))
+        with self.assertNumQueries(1):
+            typeahead.groups.search('p')
+
+    def test_suggest_endpoint(self):
+        """Эндпоинт отдаёт подсказки в JSON."""
+        response = Client().get(
+            reverse('posts:suggest', kwargs={'kind': 'users'}), {'q': 'bor'}
+        )
+        self.assertEqual(
+            response.json(),
+            {'results': [{'value': 'boris', 'label': 'boris'}]},
+        )
+        response = Client().get(
+            reverse('posts:suggest', kwargs={'kind': 'posts'})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_suggest_limit_is_clamped(self):
+        """Отрицательный limit даёт одну подсказку, а не весь диапазон."""
+        url = reverse('posts:suggest', kwargs={'kind': 'users'})
+        response = Client().get(url, {'q': 'a', 'limit': -1})
+        self.assertEqual(len(response.json()['results']), 1)
+        response = Client().get(url, {'q': 'a', 'limit': 1000})
+        self.assertEqual(len(response.json()['results']), 3)
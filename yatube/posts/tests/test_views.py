@@ -1,3 +1,4 @@
+import re
 import shutil
 import tempfile
 
@@ -5,11 +6,13 @@ from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.core.cache import cache
 from django import forms
-from ..models import Post, Group, Follow
-from .. views import POSTS_QUANTITY
+from ..models import Comment, Post, Group, Follow
+from .. views import COMMENTS_QUANTITY, POSTS_QUANTITY
 
 
 User = get_user_model()
@@ -307,7 +310,10 @@ class PaginatorViewsTest(TestCase):
                     response.context.get('page_obj').object_list,
                     obj_list_1st_page
                 )
-                response = self.client.get(reverse_name + '?page=2')
+                next_cursor = response.context['page_obj'].next_cursor
+                response = self.client.get(
+                    reverse_name + f'?before={next_cursor}'
+                )
                 # Проверка: на второй странице должно быть три поста
                 # (количество отображаемых постов посчитано как
                 # разность между количеством созданных в фикстурах постов
@@ -335,17 +341,243 @@ class CacheindexTest(TestCase):
         cache.clear()
 
     def test_cache(self):
-        """Проверка кэширования главной страницы."""
+        """Главная страница кэшируется и сбрасывается при удалении поста."""
         response = self.authorized_client.get(reverse('posts:index'))
         content = response.content
         context = response.context['page_obj']
         self.assertIn(self.post, context)
-        post = Post.objects.get(id=self.post.id)
-        post.delete()
+        # update() в обход сигналов кэш не сбрасывает
+        Post.objects.filter(id=self.post.id).update(text='Тихая правка')
         second_response = self.authorized_client.get(reverse('posts:index'))
         second_content = second_response.content
         self.assertEqual(content, second_content)
-        cache.clear()
+        post = Post.objects.get(id=self.post.id)
+        post.delete()
         third_response = self.authorized_client.get(reverse('posts:index'))
         third_content = third_response.content
         self.assertNotEqual(content, third_content)
+        self.assertNotIn(post, third_response.context['page_obj'])
+
+    def test_post_move_refreshes_old_group(self):
+        """Пост, перенесённый в другую группу, пропадает со старой."""
+        old_group = Group.objects.create(
+            title='Старая', slug='old', description='Описание'
+        )
+        new_group = Group.objects.create(
+            title='Новая', slug='new', description='Описание'
+        )
+        self.post.group = old_group
+        self.post.save()
+        url = reverse('posts:group_list', kwargs={'slug': 'old'})
+        self.assertContains(self.authorized_client.get(url), self.post.text)
+        self.post.group = new_group
+        self.post.save()
+        self.assertNotContains(
+            self.authorized_client.get(url), self.post.text
+        )
+
+    def test_follow_refreshes_profile(self):
+        """Подписка сбрасывает закэшированный профиль автора."""
+        reader = User.objects.create_user(username='cache_reader')
+        client = Client()
+        client.force_login(reader)
+        url = reverse('posts:profile', kwargs={'username': 'cache_test'})
+        self.assertFalse(client.get(url).context['following'])
+        Follow.objects.create(user=reader, author=self.user)
+        self.assertTrue(client.get(url).context['following'])
+
+
+class PerUserPageCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.alice = User.objects.create_user(username='alice')
+        cls.bob = User.objects.create_user(username='bob')
+        cls.post = Post.objects.create(author=cls.alice, text='Пост Алисы')
+
+    def setUp(self):
+        cache.clear()
+
+    def client_for(self, user):
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(user)
+        return client
+
+    def test_users_do_not_share_cached_pages(self):
+        """Закэшированная страница одного пользователя не достаётся другому."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        alice = self.client_for(self.alice)
+        self.assertContains(alice.get(url), 'Редактировать')
+        bob = self.client_for(self.bob)
+        response = bob.get(url)
+        self.assertNotContains(response, 'Редактировать')
+        self.assertContains(response, 'bob')
+        self.assertNotContains(Client().get(url), 'Редактировать')
+        # Форма комментария несёт CSRF-токен самого bob
+        token = re.search(
+            r'name="csrfmiddlewaretoken" value="([^"]+)"',
+            response.content.decode(),
+        ).group(1)
+        bob.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            data={'text': 'Комментарий bob', 'csrfmiddlewaretoken': token},
+        )
+        self.assertTrue(
+            Comment.objects.filter(post=self.post, author=self.bob).exists()
+        )
+
+    def test_profile_follow_button_is_per_user(self):
+        """Кнопка подписки в профиле своя у каждого читателя."""
+        carl = User.objects.create_user(username='carl')
+        Follow.objects.create(user=self.bob, author=self.alice)
+        url = reverse('posts:profile', kwargs={'username': 'alice'})
+        self.assertTrue(self.client_for(self.bob).get(url).context[
+            'following'
+        ])
+        response = self.client_for(carl).get(url)
+        self.assertNotContains(response, 'Отписаться')
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='card_author')
+        cls.group = Group.objects.create(
+            title='Группа карточек',
+            slug='cards',
+            description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user,
+            group=cls.group,
+            text='Текст карточки'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def get_group_page(self):
+        return self.authorized_client.get(
+            reverse('posts:group_list', kwargs={'slug': 'cards'})
+        ).content.decode()
+
+    def test_card_is_cached_until_post_changes(self):
+        """Карточка берётся из кэша, пока пост не изменён."""
+        self.get_group_page()
+        # update() в обход save() не меняет версию карточки
+        Post.objects.filter(id=self.post.id).update(text='Тихая правка')
+        self.assertIn('Текст карточки', self.get_group_page())
+        self.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.id}),
+            data={'text': 'Новый текст', 'group': self.group.id},
+        )
+        self.assertIn('Новый текст', self.get_group_page())
+
+    def test_comment_refreshes_card(self):
+        """Новый комментарий обновляет счётчик в карточке."""
+        self.assertIn('Комментарии: 0', self.get_group_page())
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.id}),
+            data={'text': 'Комментарий'},
+        )
+        self.assertIn('Комментарии: 1', self.get_group_page())
+        Comment.objects.get(post=self.post).delete()
+        self.assertIn('Комментарии: 0', self.get_group_page())
+
+    def test_group_change_refreshes_card(self):
+        """Смена адреса группы обновляет ссылку в карточке поста."""
+        self.authorized_client.get(
+            reverse('posts:profile', kwargs={'username': 'card_author'})
+        )
+        self.group.slug = 'new-cards'
+        self.group.save()
+        response = self.authorized_client.get(
+            reverse('posts:profile', kwargs={'username': 'card_author'})
+        )
+        self.assertContains(
+            response,
+            reverse('posts:group_list', kwargs={'slug': 'new-cards'})
+        )
+
+
+class PostCommentsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='commented')
+        cls.post = Post.objects.create(author=cls.user, text='Обсуждаемый')
+        cls.quiet_post = Post.objects.create(author=cls.user, text='Тихий')
+        commenters = [
+            User.objects.create_user(username=f'commenter{i}')
+            for i in range(3)
+        ]
+        Comment.objects.bulk_create(
+            Comment(
+                post=cls.post,
+                author=commenters[i % 3],
+                text=f'Комментарий {i}'
+            )
+            for i in range(COMMENTS_QUANTITY * 2 + 5)
+        )
+        Comment.objects.create(
+            post=cls.quiet_post, author=cls.user, text='Единственный'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def count_queries(self, post):
+        url = reverse('posts:post_detail', kwargs={'post_id': post.id})
+        with CaptureQueriesContext(connection) as context:
+            self.authorized_client.get(url)
+        return len(context.captured_queries)
+
+    def test_post_detail_query_count_is_fixed(self):
+        """Число запросов страницы поста не зависит от числа комментариев."""
+        self.assertEqual(
+            self.count_queries(self.post), self.count_queries(self.quiet_post)
+        )
+
+    def test_load_more_walks_all_comments(self):
+        """«Показать ещё» обходит все комментарии в обоих порядках."""
+        expected = list(
+            self.post.comments.order_by('created', 'id')
+        )
+        for order, ordered in (
+            ('oldest', expected), ('newest', expected[::-1])
+        ):
+            with self.subTest(order=order):
+                response = self.authorized_client.get(
+                    reverse(
+                        'posts:post_detail', kwargs={'post_id': self.post.id}
+                    ),
+                    {'order': order},
+                )
+                page = response.context['comments']
+                walked = list(page)
+                while page.has_next():
+                    page = self.authorized_client.get(
+                        reverse(
+                            'posts:post_comments',
+                            kwargs={'post_id': self.post.id}
+                        ),
+                        {'order': order, 'after': page.next_cursor},
+                    ).context['comments']
+                    self.assertLessEqual(len(page), COMMENTS_QUANTITY)
+                    walked.extend(page)
+                self.assertEqual(walked, ordered)
+
+    def test_out_of_range_cursor_is_ignored(self):
+        """Курсор с id больше целого базы — первая страница, а не 500."""
+        token = '1_99999999999999999999'
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+        )
+        for url in urls:
+            for name in ('before', 'after'):
+                with self.subTest(url=url, name=name):
+                    response = self.authorized_client.get(url, {name: token})
+                    self.assertEqual(response.status_code, 200)
@@ -0,0 +1,39 @@
+"""Задачи процессов пула для команды rebuild_thumbnails.
+
+Процессы пула запускаются через spawn и импортируют этот модуль ещё до
+настройки Django, поэтому модели и sorl подключаются внутри функций.
+"""
+import time
+
+import django
+from django.apps import apps
+from django.conf import settings
+
+
+def init_worker(overrides):
+    """Настраивает Django в свежем процессе пула.
+
+    overrides — настройки родителя, которых нет в модуле настроек
+    (например, заданные override_settings в тестах).
+    """
+    if not apps.ready:
+        for name, value in overrides.items():
+            setattr(settings, name, value)
+        django.setup()
+
+
+def rebuild(post_id, name):
+    """Заново рисует миниатюры одного изображения.
+
+    В базу процесс пула не пишет: нарисованное записывает в хранилище
+    sorl основной процесс (thumbnails.record).
+    """
+    from .thumbnails import render
+    start = time.perf_counter()
+    rendered = None
+    try:
+        rendered = render(name)
+        status = 'done' if rendered else 'missing'
+    except Exception:
+        status = 'failed'
+    return post_id, name, status, time.perf_counter() - start, rendered
@@ -0,0 +1,294 @@
+"""Миниатюры изображений постов готовятся заранее, а не при отрисовке.
+
+После сохранения поста с новым изображением все геометрии из geometries()
+(по одной на ширину из POST_THUMBNAIL_WIDTHS) генерируются в фоновом пуле
+потоков. Пул живёт в процессе веб-сервера; настоящая очередь задач
+с отдельными воркерами сюда не входит. Если задан THUMBNAIL_UPLOAD_WAIT,
+запрос, загрузивший изображение, дожидается своих миниатюр после
+отправки ответа (request_finished), но держит при этом воркер сервера,
+поэтому по умолчанию ожидание выключено. Тег {% post_image %}
+получает миниатюры через PregeneratedThumbnailBackend:
+он только читает готовые миниатюры, а для ещё не готовой отдаёт заглушку
+того же размера и ставит изображение в очередь.
+
+Ленты перед отрисовкой вызывают prefetch(page_obj): записи о миниатюрах
+всех постов страницы читаются из кэша одним get_many, а промахи — одним
+запросом к таблице sorl, и тегу {% thumbnail %} в цикле ходить уже
+никуда не нужно.
+"""
+from concurrent import futures
+import logging
+import threading
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import (
+    DummyImageFile, ImageFile, deserialize_image_file
+)
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore
+
+from . import page_cache
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Пропорции картинки в карточке и на странице поста
+CARD_SIZE = (960, 339)
+CARD_OPTIONS = {'padding': True, 'upscale': True}
+PLACEHOLDER_URL = (
+    "data:image/svg+xml,%3Csvg xmlns='http://www.w3.org/2000/svg' "
+    "width='{width}' height='{height}'%3E%3Crect width='100%25' "
+    "height='100%25' fill='%23e9ecef'/%3E%3C/svg%3E"
+)
+
+_executor = None
+_pending = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def geometries():
+    """Геометрии миниатюр поста (тег post_image), от узкой к широкой."""
+    width, height = CARD_SIZE
+    return [
+        (f'{size}x{round(size * height / width)}', CARD_OPTIONS)
+        for size in sorted(settings.POST_THUMBNAIL_WIDTHS)
+    ]
+
+
+class Placeholder(DummyImageFile):
+    """Серая заглушка размером с будущую миниатюру."""
+
+    @property
+    def url(self):
+        return PLACEHOLDER_URL.format(width=self.x, height=self.y)
+
+
+class PregeneratedThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl, который в запросе не декодирует и не сжимает картинки."""
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if not file_:
+            raise ValueError('falsey file_ argument in get_thumbnail()')
+        thumbnail = self.thumbnail_file(file_, geometry_string, options)
+        prefetched = getattr(_local, 'prefetched', {})
+        if thumbnail.key in prefetched:
+            cached = prefetched[thumbnail.key]
+        else:
+            cached = default.kvstore.get(thumbnail)
+        if cached:
+            return cached
+        schedule(ImageFile(file_).name)
+        return Placeholder(geometry_string)
+
+    def thumbnail_file(self, file_, geometry_string, options):
+        """Файл миниатюры, под ключом которого она лежит в хранилище sorl."""
+        source = ImageFile(file_)
+        name = self._get_thumbnail_filename(
+            source, geometry_string, self.fill_options(source, dict(options))
+        )
+        return ImageFile(name, default.storage)
+
+    def fill_options(self, source, options):
+        """Дополняет опции так же, как ThumbnailBackend.get_thumbnail.
+
+        От опций зависит имя файла миниатюры, поэтому они должны
+        совпадать с теми, с которыми миниатюра создавалась.
+        """
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        return options
+
+
+def prefetch(posts):
+    """Заранее читает готовые миниатюры изображений постов страницы.
+
+    Прочитанное запоминается до конца запроса (forget_prefetched)
+    и используется PregeneratedThumbnailBackend вместо поштучных чтений.
+    """
+    backend = PregeneratedThumbnailBackend()
+    keys = {}
+    for post in posts:
+        if not post.image:
+            continue
+        for geometry, options in geometries():
+            thumbnail = backend.thumbnail_file(post.image, geometry, options)
+            keys[add_prefix(thumbnail.key)] = thumbnail.key
+    _local.prefetched = {
+        keys[raw_key]: deserialize_image_file(value) if value else None
+        for raw_key, value in read_kvstore(list(keys)).items()
+    }
+
+
+def read_kvstore(raw_keys):
+    """Значения хранилища sorl по ключам: кэш, затем база для промахов.
+
+    Повторяет cached_db_kvstore.KVStore._get_raw для многих ключей сразу.
+    Отсутствие ключа, в отличие от sorl, в кэш не пишется: миниатюру
+    могут создать в фоне между чтением базы и записью в кэш.
+    """
+    kvstore = default.kvstore
+    if not isinstance(kvstore, cached_db_kvstore.KVStore):
+        return {key: kvstore._get_raw(key) for key in raw_keys}
+    found = kvstore.cache.get_many(raw_keys)
+    missing = [key for key in raw_keys if key not in found]
+    if missing:
+        stored = dict(
+            KVStore.objects.filter(key__in=missing).values_list(
+                'key', 'value'
+            )
+        )
+        kvstore.cache.set_many(stored, sorl_settings.THUMBNAIL_CACHE_TIMEOUT)
+        found.update(stored)
+    return {
+        key: None if found.get(key) == cached_db_kvstore.EMPTY_VALUE
+        else found.get(key)
+        for key in raw_keys
+    }
+
+
+def forget_prefetched():
+    _local.__dict__.pop('prefetched', None)
+
+
+def schedule(name, wait=False):
+    """Ставит подготовку миниатюр изображения в фон после коммита.
+
+    С wait=True текущий запрос дождётся миниатюр в wait_scheduled.
+    """
+    transaction.on_commit(lambda: submit(name, wait))
+
+
+def submit(name, wait=False):
+    global _executor
+    with _lock:
+        future = _pending.get(name)
+        if future is None:
+            if _executor is None:
+                _executor = futures.ThreadPoolExecutor(
+                    max_workers=settings.THUMBNAIL_WORKERS,
+                    thread_name_prefix='thumbnails',
+                )
+            future = _executor.submit(run, name)
+            _pending[name] = future
+    if wait:
+        _local.__dict__.setdefault('waiting', []).append(future)
+
+
+def wait_scheduled():
+    """Дожидается миниатюр, которые текущий поток поставил с wait=True.
+
+    Ждёт не дольше THUMBNAIL_UPLOAD_WAIT секунд; при нуле сразу выходит.
+    """
+    waiting = _local.__dict__.pop('waiting', None)
+    if waiting and settings.THUMBNAIL_UPLOAD_WAIT > 0:
+        futures.wait(waiting, timeout=settings.THUMBNAIL_UPLOAD_WAIT)
+
+
+def run(name):
+    try:
+        generate(name)
+    except Exception:
+        logger.exception('Не удалось подготовить миниатюры %s', name)
+    finally:
+        with _lock:
+            _pending.pop(name, None)
+        connections.close_all()
+
+
+def source_file(name):
+    """Исходное изображение по имени, в хранилище поля Post.image.
+
+    Хранилище входит в ключ sorl, поэтому миниатюры по голому имени
+    и по post.image в шаблоне иначе получили бы разные имена.
+    """
+    return ImageFile(name, Post._meta.get_field('image').storage)
+
+
+def make_thumbnails(name):
+    """Создаёт все миниатюры изображения.
+
+    Возвращает False, если исходного файла нет.
+    """
+    source = source_file(name)
+    if not source.exists():
+        return False
+    backend = ThumbnailBackend()
+    for geometry, options in geometries():
+        backend.get_thumbnail(source, geometry, **options)
+    return True
+
+
+def render(name):
+    """Заново рисует все миниатюры изображения, не заглядывая в sorl.
+
+    get_thumbnail не трогает миниатюру, о которой sorl уже знает, поэтому
+    для пересоздания файлы рисуются напрямую движком и перезаписываются.
+    С базой функция не работает: размеры исходника и миниатюр она
+    возвращает для record(). Если исходного файла нет, возвращает None.
+    """
+    source = source_file(name)
+    if not source.exists():
+        return None
+    backend = PregeneratedThumbnailBackend()
+    image = default.engine.get_image(source)
+    try:
+        image_info = default.engine.get_image_info(image)
+        rendered = []
+        for geometry, options in geometries():
+            thumbnail = backend.thumbnail_file(source, geometry, options)
+            options = backend.fill_options(source, dict(options))
+            options['image_info'] = image_info
+            # Хранилище не перезаписывает файл, а сохранило бы новый
+            # под другим именем
+            if thumbnail.exists():
+                thumbnail.delete()
+            backend._create_thumbnail(image, geometry, options, thumbnail)
+            rendered.append((thumbnail.name, thumbnail.size))
+        return default.engine.get_image_size(image), rendered
+    finally:
+        default.engine.cleanup(image)
+
+
+def record(name, rendered):
+    """Записывает в хранилище sorl миниатюры, нарисованные render()."""
+    source_size, rendered = rendered
+    source = source_file(name)
+    source.set_size(source_size)
+    default.kvstore.set(source)
+    for thumbnail_name, size in rendered:
+        thumbnail = ImageFile(thumbnail_name, default.storage)
+        thumbnail.set_size(size)
+        default.kvstore.set(thumbnail, source)
+
+
+def generate(name):
+    """Создаёт миниатюры изображения и сбрасывает кэш его постов.
+
+    Возвращает False, если исходного файла нет.
+    """
+    if not make_thumbnails(name):
+        return False
+    # Закэшированные карточки и страницы показывают заглушку
+    post_ids = list(
+        Post.objects.filter(image=name).values_list('id', flat=True)
+    )
+    Post.objects.filter(id__in=post_ids).update(updated=timezone.now())
+    tags = [page_cache.GLOBAL]
+    for post_id in post_ids:
+        tags.extend(page_cache.tags_for_post(post_id))
+    page_cache.invalidate(*tags)
+    return True
@@ -0,0 +1,188 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Новый пост сразу раскладывается по лентам подписчиков автора, поэтому
+страница /follow/ читает готовые записи TimelineEntry, а не собирает
+посты всех авторов подзапросом при каждом запросе.
+
+В гибридном режиме (FEED_MODE = 'hybrid') посты авторов, у которых
+подписчиков не меньше FEED_FANOUT_THRESHOLD, по лентам не раскладываются:
+они подмешиваются при чтении слиянием с готовой лентой. Такие авторы
+помечены UserStats.feed_pulled. Пометка снимается не сама по себе,
+а командой release_feed_authors вместе с раскладкой их постов по лентам
+(release), иначе эти посты пропали бы из лент подписчиков.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Follow, Post, TimelineEntry, UserStats
+from .paginator import CursorPaginator, MergedCursorPaginator, encode_cursor
+
+BATCH_SIZE = 500
+
+
+class TimelinePaginator(CursorPaginator):
+    """Курсорный паджинатор по TimelineEntry, отдающий сами посты."""
+
+    def __init__(self, object_list, per_page):
+        super().__init__(object_list, per_page, keys=('created', 'post_id'))
+
+    def _fetch(self, cursor=None, newer=False):
+        return [entry.post for entry in super()._fetch(cursor, newer)]
+
+    def cursor_for(self, post) -> str:
+        return encode_cursor(post.created, post.id)
+
+
+def is_pulled(author_id) -> bool:
+    """Посты автора подмешиваются при чтении, а не раскладываются."""
+    return settings.FEED_MODE == 'hybrid' and UserStats.objects.filter(
+        user_id=author_id, feed_pulled=True
+    ).exists()
+
+
+def follower_added(author_id):
+    """Помечает автора, набравшего FEED_FANOUT_THRESHOLD подписчиков."""
+    followers_added([author_id])
+
+
+def followers_added(author_ids):
+    """То же для пачки авторов, например после импорта подписок."""
+    if settings.FEED_MODE != 'hybrid':
+        return
+    UserStats.objects.filter(
+        user_id__in=author_ids,
+        feed_pulled=False,
+        followers_count__gte=settings.FEED_FANOUT_THRESHOLD,
+    ).update(feed_pulled=True)
+
+
+def release(author_id):
+    """Раскладывает посты автора по лентам и снимает пометку.
+
+    Всё в одной транзакции: читатели видят либо подмешивание,
+    либо уже полные ленты.
+    """
+    followers = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    with transaction.atomic():
+        UserStats.objects.filter(user_id=author_id).update(feed_pulled=False)
+        for user_id in followers.iterator():
+            backfill(user_id, author_id)
+
+
+def paginator_for(user, per_page):
+    """Собирает паджинатор ленты подписок пользователя."""
+    entries = TimelinePaginator(
+        user.timeline.select_related('post__author', 'post__group'),
+        per_page,
+    )
+    # Помеченных авторов подмешиваем в любом режиме: их старые посты
+    # по лентам не разложены
+    pulled = Follow.objects.filter(
+        user=user, author__stats__feed_pulled=True
+    ).values_list('author_id', flat=True)
+    sources = [entries] + [
+        CursorPaginator(
+            Post.objects.filter(author_id=author_id).select_related(
+                'author', 'group'
+            ),
+            per_page,
+        )
+        for author_id in pulled
+    ]
+    if len(sources) == 1:
+        return entries
+    return MergedCursorPaginator(sources, per_page)
+
+
+def entry_for(user_id, post):
+    return TimelineEntry(
+        user_id=user_id,
+        post_id=post.id,
+        author_id=post.author_id,
+        created=post.created,
+    )
+
+
+def fan_out(post):
+    """Добавляет новый пост в ленты всех подписчиков автора."""
+    if is_pulled(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    batch = []
+    for user_id in followers.iterator():
+        batch.append(user_id)
+        if len(batch) == BATCH_SIZE:
+            push(post, batch)
+            batch = []
+    if batch:
+        push(post, batch)
+
+
+def push(post, user_ids):
+    TimelineEntry.objects.bulk_create(
+        [entry_for(user_id, post) for user_id in user_ids],
+        ignore_conflicts=True,
+    )
+    # Обрезаем не каждую ленту на каждой вставке: лента может
+    # ненадолго вырасти на несколько записей сверх глубины,
+    # зато публикация не делает лишний запрос на каждого подписчика.
+    every = settings.FEED_TIMELINE_TRIM_EVERY
+    trim(
+        user_id for user_id in user_ids
+        if (user_id + post.id) % every == 0
+    )
+
+
+def backfill(user_id, author_id):
+    """Докладывает в ленту последние посты автора после подписки."""
+    if is_pulled(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).only(
+        'id', 'author_id', 'created'
+    )[:settings.FEED_TIMELINE_DEPTH]
+    TimelineEntry.objects.bulk_create(
+        [entry_for(user_id, post) for post in posts],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    trim([user_id])
+
+
+def remove(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild(user_id):
+    """Собирает ленту пользователя заново по текущим подпискам."""
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    authors = Follow.objects.filter(user_id=user_id).exclude(
+        author__stats__feed_pulled=True
+    ).values('author_id')
+    posts = Post.objects.filter(author_id__in=authors).only(
+        'id', 'author_id', 'created'
+    )[:settings.FEED_TIMELINE_DEPTH]
+    TimelineEntry.objects.bulk_create(
+        [entry_for(user_id, post) for post in posts],
+        batch_size=BATCH_SIZE,
+    )
+
+
+def trim(user_ids):
+    """Удаляет из лент записи глубже FEED_TIMELINE_DEPTH."""
+    depth = settings.FEED_TIMELINE_DEPTH
+    for user_id in user_ids:
+        boundary = TimelineEntry.objects.filter(user_id=user_id).order_by(
+            '-created', '-post_id'
+        ).values_list('created', 'post_id')[depth:depth + 1]
+        if not boundary:
+            continue
+        created, post_id = boundary[0]
+        TimelineEntry.objects.filter(user_id=user_id).filter(
+            Q(created__lt=created) | Q(created=created, post_id__lte=post_id)
+        ).delete()
@@ -0,0 +1,217 @@
+"""Подсказки по началу имени пользователя или названия группы.
+
+Индекс — отсортированный список пар (ключ, объект) в памяти процесса,
+поиск по префиксу — bisect до первого подходящего ключа и проход вперёд,
+пока ключи начинаются с префикса. Индекс загружается при первом запросе
+и правится на месте сигналами сохранения и удаления. Каждая правка
+получает номер из общего счётчика и записывается в кэш как пара
+(id, подсказка); остальные процессы проверяют счётчик не чаще раза
+в TYPEAHEAD_CHECK_EVERY секунд и применяют пропущенные правки у себя.
+Целиком индекс перечитывается, только если часть журнала пропала
+из кэша или процесс отстал больше чем на MAX_LAG правок.
+Список не меняется на месте, а подменяется новым, поэтому чтение
+обходится без блокировок.
+"""
+import bisect
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Group, User
+
+Suggestion = namedtuple('Suggestion', ('id', 'value', 'label'))
+
+# Символ больше любой буквы: граница диапазона ключей с префиксом
+MAX_CHAR = '\U0010ffff'
+# Сколько правок догоняем по журналу; дальше дешевле перечитать базу
+MAX_LAG = 1000
+# Сколько секунд правка хранится в журнале
+LOG_TIMEOUT = 24 * 60 * 60
+# Запись журнала «перечитать всё» после массовой записи
+RELOAD = 'reload'
+
+
+class PrefixIndex:
+    """Индекс подсказок по префиксу для одной модели."""
+
+    def __init__(self, name):
+        self.name = name
+        self._entries = None
+        self._keys = {}
+        self._seq = None
+        self._checked_at = 0
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Все подсказки из базы: итерируемое Suggestion."""
+        raise NotImplementedError
+
+    def keys_for(self, suggestion):
+        """Ключи, по началу которых находится подсказка."""
+        return {suggestion.value.lower()}
+
+    @property
+    def seq_key(self) -> str:
+        return f'typeahead:seq:{self.name}'
+
+    def change_key(self, seq) -> str:
+        return f'typeahead:change:{self.name}:{seq}'
+
+    def entries(self):
+        entries = self._entries
+        now = time.monotonic()
+        if (
+            entries is not None
+            and now - self._checked_at < settings.TYPEAHEAD_CHECK_EVERY
+        ):
+            return entries
+        seq = cache.get(self.seq_key, 0)
+        self._checked_at = now
+        if entries is None or seq != self._seq:
+            with self._lock:
+                # Пока ждали блокировку, свою правку мог записать
+                # соседний поток: номер перечитываем
+                self._sync(cache.get(self.seq_key, 0))
+                entries = self._entries
+        return entries
+
+    def _sync(self, seq):
+        """Доводит индекс до правки номер seq из общего журнала."""
+        if self._entries is not None and seq == self._seq:
+            return
+        changes = None
+        if self._entries is not None and 0 < seq - self._seq <= MAX_LAG:
+            keys = [
+                self.change_key(number)
+                for number in range(self._seq + 1, seq + 1)
+            ]
+            found = cache.get_many(keys)
+            changes = [found.get(key, RELOAD) for key in keys]
+            if RELOAD in changes:
+                changes = None
+        if changes is None:
+            self._reload(seq)
+        else:
+            self._apply(changes)
+            self._seq = seq
+
+    def _reload(self, seq):
+        entries = []
+        keys = {}
+        for suggestion in self.load():
+            keys[suggestion.id] = self.keys_for(suggestion)
+            entries.extend((key, suggestion) for key in keys[suggestion.id])
+        entries.sort()
+        self._entries = entries
+        self._keys = keys
+        self._seq = seq
+
+    def _apply(self, changes):
+        """Применяет правки (id, подсказка или None) к копии списка."""
+        entries = list(self._entries)
+        for suggestion_id, suggestion in changes:
+            if suggestion_id in self._keys:
+                entries = [
+                    entry for entry in entries
+                    if entry[1].id != suggestion_id
+                ]
+                del self._keys[suggestion_id]
+            if suggestion is not None:
+                self._keys[suggestion_id] = self.keys_for(suggestion)
+                for key in self._keys[suggestion_id]:
+                    bisect.insort(entries, (key, suggestion))
+        self._entries = entries
+
+    def search(self, prefix, limit=10):
+        """До limit подсказок с ключом на prefix, по алфавиту, без повторов."""
+        prefix = prefix.strip().lower()
+        if not prefix or limit <= 0:
+            return []
+        entries = self.entries()
+        start = bisect.bisect_left(entries, (prefix,))
+        end = bisect.bisect_left(entries, (prefix + MAX_CHAR,), lo=start)
+        found = {}
+        # Без среза: для короткого префикса диапазон может быть огромным
+        for position in range(start, end):
+            suggestion = entries[position][1]
+            found.setdefault(suggestion.id, suggestion)
+            if len(found) == limit:
+                break
+        return list(found.values())
+
+    def update(self, suggestion):
+        """Добавляет подсказку или заменяет прежнюю с тем же id."""
+        self._change(suggestion.id, suggestion)
+
+    def remove(self, suggestion_id):
+        self._change(suggestion_id, None)
+
+    def invalidate(self):
+        """Заставляет все процессы перечитать индекс из базы.
+
+        Нужно после массовой записи в обход сигналов.
+        """
+        with self._lock:
+            self._entries = None
+            self._publish(RELOAD)
+
+    def _change(self, suggestion_id, suggestion):
+        with self._lock:
+            seq = self._publish((suggestion_id, suggestion))
+            if self._entries is not None:
+                # Сначала чужие правки до нашей, иначе наша версия
+                # скроет их от этого процесса
+                self._sync(seq - 1)
+                self._apply([(suggestion_id, suggestion)])
+                self._seq = seq
+
+    def _publish(self, change) -> int:
+        """Записывает правку в общий журнал и возвращает её номер."""
+        cache.add(self.seq_key, 0, None)
+        seq = cache.incr(self.seq_key)
+        cache.set(self.change_key(seq), change, LOG_TIMEOUT)
+        return seq
+
+
+class UserIndex(PrefixIndex):
+    def load(self):
+        rows = User.objects.values_list(
+            'id', 'username', 'first_name', 'last_name'
+        )
+        for user_id, username, first_name, last_name in rows.iterator():
+            yield self.suggestion(user_id, username, first_name, last_name)
+
+    @staticmethod
+    def suggestion(user_id, username, first_name, last_name):
+        full_name = f'{first_name} {last_name}'.strip()
+        return Suggestion(user_id, username, full_name or username)
+
+    def update_user(self, user):
+        self.update(self.suggestion(
+            user.id, user.username, user.first_name, user.last_name
+        ))
+
+
+class GroupIndex(PrefixIndex):
+    def load(self):
+        rows = Group.objects.values_list('id', 'slug', 'title')
+        for group_id, slug, title in rows.iterator():
+            yield Suggestion(group_id, slug, title)
+
+    def keys_for(self, suggestion):
+        """Слаг, название и каждое слово названия.
+
+        Так «соб» находит и «Кошки и собаки».
+        """
+        title = suggestion.label.lower()
+        return {suggestion.value.lower(), title, *title.split()}
+
+    def update_group(self, group):
+        self.update(Suggestion(group.id, group.slug, group.title))
+
+
+users = UserIndex('users')
+groups = GroupIndex('groups')
@@ -1,20 +1,55 @@
 from django.urls import path
-from . import views
+from . import api, feeds, views
 
 app_name = 'posts'
 
 urlpatterns = [
     path('', views.index, name='index'),
     path('group/<slug:slug>/', views.gpoup_list, name='group_list'),
+    path('group/<slug:slug>/feed/', feeds.group_rss, name='group_feed'),
+    path(
+        'group/<slug:slug>/feed/atom/',
+        feeds.group_atom,
+        name='group_atom_feed'
+    ),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path(
+        'profile/<str:username>/feed/',
+        feeds.author_rss,
+        name='profile_feed'
+    ),
+    path(
+        'profile/<str:username>/feed/atom/',
+        feeds.author_atom,
+        name='profile_atom_feed'
+    ),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment,
         name='add_comment'
     ),
+    path('search/', views.search, name='search'),
+    path('suggest/<str:kind>/', views.suggest, name='suggest'),
+    path('api/posts/', api.index, name='api_index'),
+    path('api/posts/<int:post_id>/', api.post_detail, name='api_post'),
+    path(
+        'api/groups/<slug:slug>/posts/',
+        api.group_posts,
+        name='api_group_posts'
+    ),
+    path(
+        'api/profiles/<str:username>/posts/',
+        api.profile_posts,
+        name='api_profile_posts'
+    ),
     path('follow/', views.follow_index, name='follow_index'),
     path(
         'profile/<str:username>/follow/',
@@ -1,25 +1,39 @@
-from django.core.paginator import Paginator
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Post, Group, User, Follow
+from .models import Comment, Post, Group, User, Follow
 from .forms import PostForm, CommentForm
+from .conditional import (
+    author_validators, conditional, group_validators, post_validators
+)
+from .page_cache import (
+    GLOBAL, author_tag, cache_tagged, group_tag, post_tag, tags_for_post
+)
+from .paginator import CursorPaginator, db_int, get_page, paginate
+from .search import SearchPaginator
+from .stats import get_stats
+from . import thumbnails, timeline, typeahead
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.db import transaction
+from django.http import Http404, JsonResponse
 
 
 TEXT: str = 'Последние обновления на сайте'
 FOLLOW_TEXT: str = 'Лента'
 POSTS_QUANTITY: int = 10
-TIMEOUT: int = 20
+COMMENTS_QUANTITY: int = 20
+SUGGESTIONS_QUANTITY: int = 10
+# Первый вариант — порядок комментариев по умолчанию
+COMMENTS_ORDERS = ('oldest', 'newest')
+# Страницы сбрасываются по тегам при записи, таймаут лишь чистит кэш
+TIMEOUT: int = 60 * 60 * 6
 
 
-@cache_page(TIMEOUT)
+@cache_tagged(TIMEOUT, lambda request: [GLOBAL])
 def index(request):
     """Показывает главную страницу со всеми постами всех авторов."""
     template_name = 'posts/index.html'
     post_list = Post.objects.select_related('author', 'group').all()
-    paginator = Paginator(post_list, POSTS_QUANTITY)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(request, post_list, POSTS_QUANTITY)
+    thumbnails.prefetch(page_obj)
     context = {
         'text': TEXT,
         'page_obj': page_obj,
@@ -27,15 +41,16 @@ def index(request):
     return render(request, template_name, context)
 
 
+@conditional(group_validators)
+@cache_tagged(TIMEOUT, lambda request, slug: [group_tag(slug)])
 def gpoup_list(request, slug):
     """Показывает посты выбранной группы."""
     template_name = 'posts/group_list.html'
     group = get_object_or_404(Group, slug=slug)
     description = group.description
     post_list = group.posts.select_related("author")
-    paginator = Paginator(post_list, POSTS_QUANTITY)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = paginate(request, post_list, POSTS_QUANTITY)
+    thumbnails.prefetch(page_obj)
     context = {
         'text': f'Записи сообщества {group.__str__()}',
         'description': description,
@@ -45,6 +60,8 @@ def gpoup_list(request, slug):
     return render(request, template_name, context)
 
 
+@conditional(author_validators)
+@cache_tagged(TIMEOUT, lambda request, username: [author_tag(username)])
 def profile(request, username):
     """Показывает посты выбранного автора."""
     template_name = 'posts/profile.html'
@@ -59,12 +76,12 @@ def profile(request, username):
     else:
         following = False
     post_list = author.posts.select_related('group')
-    paginator = Paginator(post_list, POSTS_QUANTITY)
-    count = paginator.count
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    stats = get_stats(author)
+    page_obj = paginate(request, post_list, POSTS_QUANTITY)
+    thumbnails.prefetch(page_obj)
     context = {
-        'count': count,
+        'count': stats.posts_count,
+        'stats': stats,
         'author': author,
         'page_obj': page_obj,
         'following': following,
@@ -72,23 +89,53 @@ def profile(request, username):
     return render(request, template_name, context)
 
 
+@conditional(post_validators)
+@cache_tagged(TIMEOUT, lambda request, post_id: tags_for_post(post_id))
 def post_detail(request, post_id):
     """Показывает страницу с детальной информацией о посте."""
     template_name = 'posts/post_detail.html'
-    post = get_object_or_404(Post, id=post_id)
-    post_list = Post.objects.filter(author_id=post.author).all()
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id
+    )
+    order = comments_order(request)
     form = CommentForm(request.POST or None)
-    count = post_list.count()
     context = {
-        'count': count,
+        'count': get_stats(post.author).posts_count,
         'post': post,
         'form': form,
-        'comments': comments,
+        'comments': comments_page(post.id, order),
+        'order': order,
+    }
+    return render(request, template_name, context)
+
+
+@cache_tagged(TIMEOUT, lambda request, post_id: [post_tag(post_id)])
+def post_comments(request, post_id):
+    """Отдаёт следующую порцию комментариев для кнопки «Показать ещё»."""
+    template_name = 'posts/includes/comment_list.html'
+    order = comments_order(request)
+    context = {
+        'post_id': post_id,
+        'comments': comments_page(post_id, order, request.GET.get('after')),
+        'order': order,
     }
     return render(request, template_name, context)
 
 
+def comments_order(request):
+    order = request.GET.get('order')
+    return order if order in COMMENTS_ORDERS else COMMENTS_ORDERS[0]
+
+
+def comments_page(post_id, order, cursor=None):
+    """Порция комментариев поста с авторами одним запросом."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    )
+    paginator = CursorPaginator(comments, COMMENTS_QUANTITY)
+    return paginator.get_more(cursor, ascending=order == 'oldest')
+
+
 @login_required
 def post_create(request):
     """Создать новый пост."""
@@ -98,6 +145,8 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        if post.image:
+            thumbnails.schedule(post.image.name, wait=True)
         username = post.author.username
         return redirect('posts:profile', username)
     return render(request, template_name, {'form': form})
@@ -114,12 +163,82 @@ def post_edit(request, post_id):
     )
     if post.author == request.user:
         if form.is_valid():
-            post = form.save()
+            post = form.save(commit=False)
+            post.save(update_fields=PostForm.SAVED_FIELDS)
+            if post.image and 'image' in form.changed_data:
+                thumbnails.schedule(post.image.name, wait=True)
             return redirect('posts:post_detail', post_id)
         return render(request, template_name, {'form': form, 'is_edit': True})
     return redirect('posts:post_detail', post_id)
 
 
+def search(request):
+    """Ищет посты по тексту; группы и авторы найденного — фильтры."""
+    template_name = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    group_id = int_param(request, 'group')
+    author_id = int_param(request, 'author')
+    paginator = SearchPaginator(query, POSTS_QUANTITY, group_id, author_id)
+    page_obj = paginator.get_page(request.GET.get('after'))
+    thumbnails.prefetch(page_obj)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'group_facets': [
+            (facet, *facet_link(request, 'group', facet, group_id))
+            for facet in paginator.group_facets()
+        ],
+        'author_facets': [
+            (facet, *facet_link(request, 'author', facet, author_id))
+            for facet in paginator.author_facets()
+        ],
+        'first_url': search_url(request),
+        'next_url': search_url(request, after=page_obj.next_cursor),
+    }
+    return render(request, template_name, context)
+
+
+def suggest(request, kind):
+    """Подсказки по началу имени пользователя (users) или группы (groups)."""
+    indexes = {'users': typeahead.users, 'groups': typeahead.groups}
+    if kind not in indexes:
+        raise Http404
+    limit = max(1, min(
+        int_param(request, 'limit') or SUGGESTIONS_QUANTITY,
+        SUGGESTIONS_QUANTITY,
+    ))
+    suggestions = indexes[kind].search(request.GET.get('q', ''), limit)
+    return JsonResponse({'results': [
+        {'value': suggestion.value, 'label': suggestion.label}
+        for suggestion in suggestions
+    ]})
+
+
+def int_param(request, name):
+    try:
+        return db_int(request.GET[name])
+    except (KeyError, ValueError):
+        return None
+
+
+def search_url(request, **changes):
+    """Ссылка на поиск с теми же параметрами, кроме changes и курсора."""
+    params = request.GET.copy()
+    params.pop('after', None)
+    for name, value in changes.items():
+        params.pop(name, None)
+        if value is not None:
+            params[name] = value
+    return '?' + params.urlencode()
+
+
+def facet_link(request, name, facet, selected):
+    """Ссылка фасета и признак того, что фильтр уже выбран."""
+    active = facet.value.pk == selected
+    value = None if active else facet.value.pk
+    return search_url(request, **{name: value}), active
+
+
 @login_required
 def add_comment(request, post_id):
     """Добавить комментарий к посту."""
@@ -129,7 +248,9 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        # Комментарий и счётчик comments_count меняются вместе
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
@@ -138,11 +259,11 @@ def follow_index(request):
     """Показывает посты авторов, на которых подписан пользователь."""
     # информация о текущем пользователе доступна в переменной request.user
     template_name = 'posts/follow.html'
-    authors = Follow.objects.filter(user=request.user).values('author')
-    post_list = Post.objects.filter(author__in=authors).all()
-    paginator = Paginator(post_list, POSTS_QUANTITY)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Лента заранее собрана в TimelineEntry при публикации постов;
+    # посты авторов с огромным числом подписчиков подмешиваются при чтении
+    paginator = timeline.paginator_for(request.user, POSTS_QUANTITY)
+    page_obj = get_page(request, paginator)
+    thumbnails.prefetch(page_obj)
     context = {
         'text': FOLLOW_TEXT,
         'following': True,
@@ -157,8 +157,50 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Двухуровневый кэш: LRU в памяти каждого воркера и общий для всех
+# воркеров файл SQLite, через который расходятся инвалидации. Значения
+# в файле хранятся pickle, поэтому он лежит в проекте, а не в общем /tmp;
+# тесты получают свой файл (core.test_runner)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_PATH', os.path.join(BASE_DIR, 'cache.sqlite3')
+        ),
+        'OPTIONS': {
+            'L1_MAX_ENTRIES': 1000,
+            'MAX_ENTRIES': 10000,
+        },
     }
 }
+
+TEST_RUNNER = 'core.test_runner.IsolatedCacheRunner'
+
+# Большая сторона загруженного изображения поста после пережатия
+POST_IMAGE_MAX_SIDE = 2048
+
+# Миниатюры постов генерируются в фоне после загрузки изображения,
+# шаблоны только читают готовые (posts/thumbnails.py)
+THUMBNAIL_BACKEND = 'posts.thumbnails.PregeneratedThumbnailBackend'
+# Пул живёт в процессе веб-сервера и делит с ним процессор
+THUMBNAIL_WORKERS = 1
+# Сколько секунд запрос с загрузкой ждёт миниатюр после отправки ответа.
+# Всё это время воркер сервера не берёт новые запросы, поэтому по
+# умолчанию не ждём: до готовности миниатюр шаблон покажет заглушку
+THUMBNAIL_UPLOAD_WAIT = 0
+# Ширины миниатюр для srcset: браузер сам выбирает подходящую экрану
+POST_THUMBNAIL_WIDTHS = (320, 640, 960)
+
+# Как часто (в секундах) индекс подсказок проверяет правки других процессов
+TYPEAHEAD_CHECK_EVERY = 1
+
+# Материализованная лента подписок: сколько последних постов хранить
+# на подписчика и как часто (раз в сколько вставок) обрезать ленту
+FEED_TIMELINE_DEPTH = 800
+FEED_TIMELINE_TRIM_EVERY = 10
+
+# Режим ленты подписок: 'push' раскладывает посты всех авторов по лентам,
+# 'hybrid' подмешивает при чтении посты авторов, у которых подписчиков
+# не меньше FEED_FANOUT_THRESHOLD
+FEED_MODE = 'hybrid'
+FEED_FANOUT_THRESHOLD = 10000